@@ -1 +1,2 @@
+from .edittool import EditConfig
 from .edittool import parse_edit_config
@@ -0,0 +1,506 @@
+#!/usr/bin/env python3
+# -*- coding: utf8 -*-
+
+# pylint: disable=missing-docstring               # [C0111] docstrings are always outdated and wrong
+# pylint: disable=missing-module-docstring        # [C0114] Missing module docstring
+# pylint: disable=fixme                           # [W0511] todo is encouraged
+# pylint: disable=line-too-long                   # [C0301]
+# pylint: disable=invalid-name                    # [C0103] single letter var names, func name too descriptive
+# pylint: disable=too-many-locals                 # [R0914]
+
+from __future__ import annotations
+
+import statistics
+import subprocess
+import sys
+import time
+
+from eprint import eprint
+
+# modules that must not be imported just to start the cli,
+# they are imported by the functions that need them
+LAZY_MODULES = (
+    "sh",
+    "byte_vector_replacer",
+    "licenseguesser",
+    "portagetool",
+    "hashtool",
+    "gittool",
+    "unmp",
+    "walkup_until_found",
+    "with_chdir",
+    "configtool",
+)
+
+
+def parse_importtime(stderr: str) -> dict[str, tuple[int, int]]:
+    # import time: self [us] | cumulative | imported package
+    result = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:") :].split("|")
+        if len(fields) != 3:
+            continue
+        try:
+            self_us = int(fields[0])
+            cumulative_us = int(fields[1])
+        except ValueError:  # the header line
+            continue
+        result[fields[2].strip()] = (self_us, cumulative_us)
+    return result
+
+
+def measure_startup(
+    *,
+    module: str,
+) -> tuple[float, dict[str, tuple[int, int]]]:
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    return wall_ms, parse_importtime(proc.stderr)
+
+
+def benchmark_startup(
+    *,
+    module: str,
+    runs: int,
+    budget_ms: float,
+    top: int = 10,
+) -> bool:
+    wall_times = []
+    import_times = []
+    imports: dict[str, tuple[int, int]] = {}
+    for _ in range(runs):
+        wall_ms, imports = measure_startup(module=module)
+        wall_times.append(wall_ms)
+        import_times.append(imports[module][1] / 1000)
+
+    import_ms = statistics.median(import_times)
+    print(
+        f"{module}: median import {import_ms:.1f}ms, median process wall {statistics.median(wall_times):.1f}ms over {runs} runs (budget {budget_ms:.1f}ms)"
+    )
+    heaviest = sorted(imports.items(), key=lambda item: item[1][0], reverse=True)
+    for name, (self_us, cumulative_us) in heaviest[:top]:
+        print(
+            f"{self_us / 1000:8.2f}ms self {cumulative_us / 1000:8.2f}ms cumulative {name}"
+        )
+
+    ok = True
+    eager = sorted({name for name in imports if name.split(".")[0] in LAZY_MODULES})
+    if eager:
+        eprint("ERROR: imported at startup:", ", ".join(eager))
+        ok = False
+    if import_ms > budget_ms:
+        eprint(
+            f"ERROR: startup import {import_ms:.1f}ms exceeds budget {budget_ms:.1f}ms"
+        )
+        ok = False
+    return ok
+
+
+def legacy_parse_sh_var(*, item, var_name):
+    if f'{var_name}="' in item:
+        result = item.split("=")[-1].strip('"').strip("'")
+        return result
+
+
+def legacy_parse_edit_config_text(text: str):
+    # the parse_edit_config() loop before EditConfig, for comparison
+    short_package = None
+    group = None
+    remote = None
+    test_command_arg = None
+    dont_reformat = None
+    install_command = None
+    skip_test = None
+    for item in text.splitlines():
+        if not short_package:
+            short_package = legacy_parse_sh_var(item=item, var_name="short_package")
+        if not group:
+            group = legacy_parse_sh_var(item=item, var_name="group")
+        if not remote:
+            remote = legacy_parse_sh_var(item=item, var_name="remote")
+        if not test_command_arg:
+            test_command_arg = legacy_parse_sh_var(
+                item=item, var_name="test_command_arg"
+            )
+        if not dont_reformat:
+            dont_reformat = legacy_parse_sh_var(item=item, var_name="dont_reformat")
+        if not install_command:
+            install_command = legacy_parse_sh_var(item=item, var_name="install_command")
+        if not skip_test:
+            skip_test = legacy_parse_sh_var(item=item, var_name="skip_test")
+    return (
+        short_package,
+        group,
+        remote,
+        test_command_arg,
+        dont_reformat,
+        install_command,
+        skip_test,
+    )
+
+
+def synthetic_edit_config(*, lines: int) -> str:
+    # unrelated variables first, so both parsers have to scan the whole file
+    content = [f'unrelated_variable_{index}="value_{index}"' for index in range(lines)]
+    content.extend(
+        [
+            'short_package="synthetic"',
+            'group="dev-python"',
+            'remote="https://github.com/example/synthetic"',
+            'test_command_arg="--help"',
+            'install_command="true"',
+        ]
+    )
+    return "\n".join(content) + "\n"
+
+
+def time_function(function, *, runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def benchmark_edit_config(
+    *,
+    lines: int,
+    runs: int,
+) -> None:
+    from pathlib import Path
+
+    from .edittool import parse_edit_config_text
+
+    text = synthetic_edit_config(lines=lines)
+    path = Path(".edit_config")
+    legacy = time_function(lambda: legacy_parse_edit_config_text(text), runs=runs)
+    current = time_function(
+        lambda: parse_edit_config_text(text=text, path=path),
+        runs=runs,
+    )
+    print(f"{lines} lines, median of {runs} runs:")
+    print(f"legacy parse_sh_var loop: {legacy * 1000:10.3f}ms")
+    print(
+        f"parse_edit_config_text:   {current * 1000:10.3f}ms ({legacy / current:.1f}x)"
+    )
+
+
+# fast stand-ins for the external tools edit drives, so the timings are
+# edittool's own overhead: process startup, config parsing, git handling
+# and README assembly
+STUB_TOOLS = {
+    "black": "exit 0",
+    "isort": "exit 0",
+    "pylint": "exit 0",
+    "portagetool": "exit 0",
+    "emaint": "exit 0",
+    "ebuild": "exit 0",
+    "chown": "exit 0",
+    "sudo": 'exec "$@"',
+    "synthetic": 'echo "synthetic $*"',
+}
+
+
+def write_stub_tools(bin_folder) -> None:
+    import os
+
+    bin_folder.mkdir(parents=True, exist_ok=True)
+    for name, body in STUB_TOOLS.items():
+        _path = bin_folder / name
+        _path.write_text(f"#!/bin/sh\n{body}\n", encoding="utf8")
+        os.chmod(_path, 0o755)
+
+
+def synthetic_project(
+    *,
+    folder,
+    files: int,
+    readme_examples: int,
+    env: dict[str, str],
+) -> list:
+    # a git repo with .edit_config, the README inputs and N python files
+    from pathlib import Path
+
+    folder.mkdir(parents=True)
+    # no install_command, so the install goes through the portagetool stub
+    (folder / ".edit_config").write_text(
+        'short_package="synthetic"\ngroup="dev-python"\ntest_command_arg="--help"\n',
+        encoding="utf8",
+    )
+    (folder / ".description.md").write_text("synthetic project\n", encoding="utf8")
+    (folder / ".install.md").write_text("emerge synthetic\n", encoding="utf8")
+    script = ["#!/bin/sh"]
+    script.extend(f"synthetic --example {index}" for index in range(readme_examples))
+    (folder / ".autogenerate_readme.sh").write_text(
+        "\n".join(script) + "\n", encoding="utf8"
+    )
+    package = folder / "synthetic"
+    package.mkdir()
+    paths = []
+    for index in range(files):
+        _path = package / Path(f"module_{index}.py")
+        _path.write_text(f"VALUE_{index} = {index}\n", encoding="utf8")
+        paths.append(_path)
+    for args in (["init", "-q"], ["add", "-A"], ["commit", "-q", "-m", "initial"]):
+        subprocess.run(["git", *args], cwd=folder, env=env, check=True)
+    return paths
+
+
+def read_profile_log(path) -> dict[str, float]:
+    import json
+
+    totals: dict[str, float] = {}
+    if not path.exists():
+        return totals
+    with open(path, "r", encoding="utf8") as fh:
+        for line in fh:
+            for _stage in json.loads(line)["stages"]:
+                totals[_stage["stage"]] = (
+                    totals.get(_stage["stage"], 0.0) + _stage["wall"]
+                )
+    path.unlink()
+    return totals
+
+
+def time_edit_batch(
+    *, paths, env: dict[str, str], profile_log
+) -> tuple[float, dict[str, float]]:
+    # one edit process over the batch, every file gets a new line first so
+    # each one goes through formatting, git, commit, install and test
+    for _path in paths:
+        with open(_path, "a", encoding="utf8") as fh:
+            fh.write(f"# {time.time_ns()}\n")
+    command = [
+        sys.executable,
+        "-c",
+        "from edittool.edittool import cli; cli()",
+        "edit",
+        "--non-interactive",
+        "--disable-change-detection",
+        "--skip-black",
+        "--skip-isort",
+        "--no-cache",
+        "--apps-folder",
+        "apps",
+        "--gentoo-overlay-repo",
+        "overlay",
+        "--github-user",
+        "user",
+        "--profile-log",
+        profile_log.as_posix(),
+        *[_path.as_posix() for _path in paths],
+    ]
+    start = time.perf_counter()
+    subprocess.run(
+        command,
+        cwd=paths[0].parent,
+        env=env,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        check=True,
+    )
+    return time.perf_counter() - start, read_profile_log(profile_log)
+
+
+def time_readme_assembly(*, folder, runs: int) -> float:
+    # assemble_readme() directly, edit skips the README when the synthetic
+    # package is not installed
+    import io
+
+    from .edittool import assemble_readme
+
+    script = folder / ".autogenerate_readme.sh"
+    return time_function(
+        lambda: assemble_readme(autogenerate_readme_script=script, out=io.BytesIO()),
+        runs=runs,
+    )
+
+
+def benchmark_projects(
+    *,
+    files: int,
+    batch_sizes: tuple[int, ...],
+    runs: int,
+    readme_examples: int,
+    log=None,
+) -> None:
+    import json
+    import os
+    import tempfile
+    from pathlib import Path
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="edittool-benchmark-") as _root:
+        root = Path(_root)
+        write_stub_tools(root / "bin")
+        package_root = Path(__file__).resolve().parent.parent
+        env = dict(os.environ)
+        env.update(
+            {
+                "PATH": f"{root / 'bin'}{os.pathsep}{env.get('PATH', '')}",
+                "PYTHONPATH": os.pathsep.join(
+                    filter(None, (package_root.as_posix(), env.get("PYTHONPATH")))
+                ),
+                "EDITOR": "/bin/true",
+                "XDG_CACHE_HOME": (root / "cache").as_posix(),
+                "GIT_AUTHOR_NAME": "benchmark",
+                "GIT_AUTHOR_EMAIL": "benchmark@example.com",
+                "GIT_COMMITTER_NAME": "benchmark",
+                "GIT_COMMITTER_EMAIL": "benchmark@example.com",
+            }
+        )
+        paths = synthetic_project(
+            folder=root / "project",
+            files=files,
+            readme_examples=readme_examples,
+            env=env,
+        )
+        profile_log = root / "profile.jsonl"
+
+        for batch_size in batch_sizes:
+            batch = paths[:batch_size]
+            wall_times = []
+            stage_times: dict[str, list[float]] = {}
+            for _ in range(runs):
+                wall, stages = time_edit_batch(
+                    paths=batch, env=env, profile_log=profile_log
+                )
+                wall_times.append(wall)
+                for _stage, _wall in stages.items():
+                    stage_times.setdefault(_stage, []).append(_wall)
+            wall = statistics.median(wall_times)
+            stages = {
+                _stage: statistics.median(_walls)
+                for _stage, _walls in stage_times.items()
+            }
+            # process startup, config parsing and everything between stages
+            overhead = wall - sum(stages.values())
+            print(
+                f"edit --non-interactive, {len(batch)} files, median of {runs} runs: {wall * 1000:.1f}ms ({wall * 1000 / len(batch):.1f}ms/file)"
+            )
+            for _stage, _wall in sorted(
+                stages.items(), key=lambda item: item[1], reverse=True
+            ):
+                print(f"    {_stage:<20} {_wall * 1000:10.1f}ms")
+            print(f"    {'(unaccounted)':<20} {overhead * 1000:10.1f}ms")
+            results.append(
+                {
+                    "benchmark": "edit",
+                    "files": len(batch),
+                    "wall": wall,
+                    "stages": stages,
+                    "unaccounted": overhead,
+                }
+            )
+
+        old_path = os.environ["PATH"]
+        os.environ["PATH"] = env["PATH"]
+        try:
+            readme = time_readme_assembly(folder=root / "project", runs=runs)
+        finally:
+            os.environ["PATH"] = old_path
+        print(
+            f"README assembly, {readme_examples} examples, median of {runs} runs: {readme * 1000:.1f}ms"
+        )
+        results.append(
+            {"benchmark": "readme", "examples": readme_examples, "wall": readme}
+        )
+
+    if log is not None:
+        with open(log, "a", encoding="utf8") as fh:
+            fh.write(
+                json.dumps(
+                    {
+                        "time": time.time(),
+                        "files": files,
+                        "runs": runs,
+                        "results": results,
+                    }
+                )
+                + "\n"
+            )
+
+
+def legacy_byte_vector_replace(source: bytes) -> bytes:
+    # byte_vector_replace_source() before the compiled engine: the pairs
+    # from get_pairs() for every file, one bytes.replace() per pair
+    from byte_vector_replacer import get_pairs
+
+    from .edittool import as_bytes
+
+    result = source
+    for _match, _replacement in get_pairs().items():
+        result = result.replace(as_bytes(_match), as_bytes(_replacement))
+    return result
+
+
+def synthetic_source(*, size: int, pairs) -> bytes:
+    # python-ish lines with a match from the pair set every few lines
+    import itertools
+
+    matches = itertools.cycle(sorted(pairs) or [b""])
+    lines = []
+    total = 0
+    index = 0
+    while total < size:
+        line = f"    value_{index} = compute(value_{index - 1}, {index})  # ".encode(
+            "utf8"
+        )
+        if index % 4 == 0:
+            line += next(matches)
+        line += b"\n"
+        lines.append(line)
+        total += len(line)
+        index += 1
+    return b"".join(lines)
+
+
+def benchmark_byte_vector_replacer(
+    *,
+    megabytes: float,
+    files: int,
+    file_kilobytes: float,
+    runs: int,
+) -> None:
+    from .edittool import byte_vector_replacer_engine
+
+    start = time.perf_counter()
+    engine = byte_vector_replacer_engine()
+    print(
+        f"{len(engine.pairs)} pairs, {'single pass regex' if engine.pattern is not None else 'bytes.replace per pair'}, loaded in {(time.perf_counter() - start) * 1000:.1f}ms"
+    )
+
+    large = synthetic_source(size=int(megabytes * 1024 * 1024), pairs=engine.pairs)
+    small = [
+        synthetic_source(size=int(file_kilobytes * 1024), pairs=engine.pairs)
+        for _ in range(files)
+    ]
+    assert engine.replace(large) == legacy_byte_vector_replace(large)
+
+    for name, sources in (
+        (f"1 file of {len(large) / 1024 / 1024:.1f}MB", [large]),
+        (f"{files} files of {file_kilobytes:.0f}KB", small),
+    ):
+        size_mb = sum(len(_source) for _source in sources) / 1024 / 1024
+        legacy = time_function(
+            lambda: [legacy_byte_vector_replace(_source) for _source in sources],
+            runs=runs,
+        )
+        current = time_function(
+            lambda: [engine.replace(_source) for _source in sources], runs=runs
+        )
+        print(f"{name}, median of {runs} runs:")
+        print(f"    get_pairs() + bytes.replace per pair: {size_mb / legacy:10.1f}MB/s")
+        print(
+            f"    compiled engine:                      {size_mb / current:10.1f}MB/s ({legacy / current:.1f}x)"
+        )
@@ -22,78 +22,629 @@
 
 from __future__ import annotations
 
+import contextlib
 import errno
+import functools
+import hashlib
+import json
 import logging
 import os
 import pty
-import select
+import selectors
 import shutil
+import stat
+import struct
 import subprocess
 import sys
+import threading
+import time
+from collections.abc import Callable
 from collections.abc import Sequence
+from dataclasses import dataclass
 from pathlib import Path
 from signal import SIG_DFL
 from signal import SIGPIPE
 from signal import signal
+from typing import BinaryIO
 
 import click
-import sh
 from asserttool import gvd
 from asserttool import ic
 from asserttool import icp
 from asserttool import not_root
-from byte_vector_replacer import GuardFoundError
-from byte_vector_replacer import byte_vector_replacer
-from byte_vector_replacer import get_pairs
+from click.core import ParameterSource
 from click_default_group import DefaultGroup
 from clicktool import click_add_options
 from clicktool import click_global_options
 from clicktool import tvicgvd
-from configtool import click_read_config
 from eprint import eprint
-from gittool import unstaged_commits_exist
-from hashtool import sha3_256_hash_file
-from licenseguesser import build_license_list
-from portagetool import package_atom_installed
-from unmp import unmp
-from walkup_until_found import walkup_until_found
-from with_chdir import chdir
+
+# everything else is imported inside the function that needs it, so the
+# startup cost of a subcommand only covers the dependencies it uses.
+# benchmark-startup guards this, see LAZY_MODULES in benchmark.py
 
 # from retry_on_exception import retry_on_exception
 logging.basicConfig(level=logging.INFO)
 
 signal(SIGPIPE, SIG_DFL)
 
-# pylint: disable=no-name-in-module  # E0611 # No name 'ErrorReturnCode_1' in module 'sh'
-from sh import CommandNotFound
-from sh import ErrorReturnCode_1
 
-# pylint: enable=no-name-in-module
+@functools.cache
+def read_config() -> dict:
+    from configtool import click_read_config
 
-CFG, CONFIG_MTIME = click_read_config(
-    click_instance=click,
-    app_name="edittool",
-)
+    CFG, CONFIG_MTIME = click_read_config(
+        click_instance=click,
+        app_name="edittool",
+    )
+    ic(CFG, CONFIG_MTIME)
+    return CFG
 
 
 # https://github.com/mitsuhiko/click/issues/441
-CONTEXT_SETTINGS = dict(default_map=CFG)
+# the default_map is filled in by cli() via read_config(), after the
+# subcommand is known
+CONTEXT_SETTINGS: dict = {}
 # dict(help_option_names=['--help'],
 #     terminal_width=shutil.get_terminal_size((80, 20)).columns)
 
 
-ic(CFG)
+def cache_dir() -> Path:
+    _cache_home = os.environ.get("XDG_CACHE_HOME")
+    if not _cache_home:
+        _cache_home = Path("~/.cache").expanduser().as_posix()
+    return Path(_cache_home) / Path("edittool")
+
+
+@functools.cache
+def module_fingerprint(name: str) -> str:
+    # version plus newest source mtime, without importing the module
+    import importlib.metadata
+    import importlib.util
+
+    try:
+        version = importlib.metadata.version(name)
+    except importlib.metadata.PackageNotFoundError:
+        version = "unknown"
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        return f"{version}:missing"
+    sources = []
+    if spec.submodule_search_locations:
+        for location in spec.submodule_search_locations:
+            sources.extend(Path(location).glob("*.py"))
+    elif spec.origin:
+        sources.append(Path(spec.origin))
+    mtime = max((_source.stat().st_mtime_ns for _source in sources), default=0)
+    return f"{version}:{mtime}"
+
+
+@contextlib.contextmanager
+def atomic_output(path: Path):
+    # yields a binary file that replaces path with one rename when the
+    # block exits cleanly, keeping the mode of the file it replaces. A
+    # symlink is followed, the file it points to is replaced.
+    import tempfile
+
+    path = path.resolve()
+    try:
+        mode = stat.S_IMODE(path.stat().st_mode)
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        mode = 0o666 & ~umask
+    fd, _tmp = tempfile.mkstemp(
+        dir=path.parent,
+        prefix=f".{path.name}.",
+        suffix=".tmp",
+    )
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            yield fh
+            os.fchmod(fh.fileno(), mode)
+        os.replace(_tmp, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(_tmp)
+        raise
+
+
+def atomic_write_bytes(*, path: Path, data: bytes) -> None:
+    with atomic_output(path) as fh:
+        fh.write(data)
+
+
+def write_cache_file(*, path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    atomic_write_bytes(path=path, data=data)
+
+
+LICENSE_CACHE_VERSION = 1
+
+
+@functools.cache
+def cached_license_list() -> tuple[str, ...]:
+    cache_file = cache_dir() / Path("license_list.json")
+    fingerprint = module_fingerprint("licenseguesser")
+    try:
+        cached = json.loads(cache_file.read_bytes())
+        if (
+            cached["version"] == LICENSE_CACHE_VERSION
+            and cached["licenseguesser"] == fingerprint
+        ):
+            return tuple(cached["licenses"])
+    except (FileNotFoundError, ValueError, KeyError, TypeError) as e:
+        ic(e)
+
+    from licenseguesser import build_license_list
+
+    licenses = tuple(build_license_list())
+    cached = {
+        "version": LICENSE_CACHE_VERSION,
+        "licenseguesser": fingerprint,
+        "licenses": licenses,
+    }
+    try:
+        write_cache_file(path=cache_file, data=json.dumps(cached).encode("utf8"))
+    except OSError as e:
+        ic(e)
+    return licenses
+
+
+class LazyChoice(click.Choice):
+    # click.Choice that builds its choices on first use, and does not
+    # validate an unchanged default, so the choices are only built when
+    # the option is actually given (or --help is shown)
+
+    def __init__(self, choices_function, case_sensitive: bool = True):
+        self._choices_function = choices_function
+        super().__init__((), case_sensitive)
+        # the empty choices set by click.Choice are replaced on first use
+        self._choices: tuple[str, ...] | None = None
+
+    @property
+    def choices(self):
+        if self._choices is None:
+            self._choices = tuple(self._choices_function())
+        return self._choices
+
+    @choices.setter
+    def choices(self, choices) -> None:
+        self._choices = tuple(choices)
+
+    def convert(self, value, param, ctx):
+        if (
+            ctx is not None
+            and param is not None
+            and ctx.get_parameter_source(param.name) is ParameterSource.DEFAULT
+        ):
+            return value
+        return super().convert(value, param, ctx)
+
+
+RESULT_CACHE_RESCAN_PUTS = 1024
+RESULT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+FORMAT_CONFIG_FILES = (
+    "pyproject.toml",
+    ".isort.cfg",
+    "setup.cfg",
+    "tox.ini",
+    ".editorconfig",
+)
+PYLINT_CONFIG_FILES = (
+    "pylintrc",
+    ".pylintrc",
+    "pyproject.toml",
+    "setup.cfg",
+    "tox.ini",
+)
+
+
+def config_fingerprint(*, path: Path, names: Sequence[str]) -> str:
+    # the tool config files that could apply to path, and their mtimes
+    found = []
+    for _directory in path.parents:
+        for _name in names:
+            try:
+                _stat = (_directory / Path(_name)).stat()
+            except OSError:
+                continue
+            found.append(f"{_directory / Path(_name)}:{_stat.st_mtime_ns}")
+    return "\n".join(found)
+
+
+class ResultCache:
+    # persistent results keyed on a hash of everything that determines them,
+    # under $XDG_CACHE_HOME/edittool/results/<namespace>/. A hit refreshes
+    # the entry's mtime, put() evicts the least recently used entries once
+    # the namespace is over max_bytes. The namespace size is kept in .size
+    # and only rescanned when that passes max_bytes, or every
+    # RESULT_CACHE_RESCAN_PUTS puts in a process to correct the drift from
+    # concurrent writers.
+
+    _puts: dict[Path, int] = {}
+
+    def __init__(
+        self,
+        *,
+        namespace: str,
+        enabled: bool = True,
+        max_bytes: int = RESULT_CACHE_MAX_BYTES,
+    ):
+        self.path = cache_dir() / Path("results") / Path(namespace)
+        self.enabled = enabled
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def key(*parts: str | bytes) -> str:
+        _hash = hashlib.sha3_256()
+        for _part in parts:
+            _part = as_bytes(_part)
+            _hash.update(len(_part).to_bytes(8, "little"))
+            _hash.update(_part)
+        return _hash.hexdigest()
+
+    def entry_path(self, key: str) -> Path:
+        return self.path / Path(key[:2]) / Path(key)
+
+    def get(self, key: str) -> bytes | None:
+        if not self.enabled:
+            return None
+        _entry = self.entry_path(key)
+        try:
+            data = _entry.read_bytes()
+            os.utime(_entry)
+        except OSError:
+            return None
+        return data
+
+    def size_path(self) -> Path:
+        return self.path / Path(".size")
+
+    def put(self, key: str, data: bytes) -> None:
+        if not self.enabled:
+            return
+        try:
+            write_cache_file(path=self.entry_path(key), data=data)
+            try:
+                total = int(self.size_path().read_text()) + len(data)
+            except (FileNotFoundError, ValueError):
+                total = None
+            puts = self._puts.get(self.path, 0) + 1
+            self._puts[self.path] = puts
+            if (
+                total is None
+                or total > self.max_bytes
+                or puts % RESULT_CACHE_RESCAN_PUTS == 0
+            ):
+                self.evict()
+            else:
+                write_cache_file(path=self.size_path(), data=str(total).encode("utf8"))
+        except OSError as e:
+            ic(e)
+
+    def evict(self) -> None:
+        entries = []
+        total = 0
+        for _entry in self.path.glob("*/*"):
+            try:
+                _stat = _entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((_stat.st_mtime_ns, _stat.st_size, _entry))
+            total += _stat.st_size
+        if total > self.max_bytes:
+            # down to 90%, so the next puts do not each trigger a rescan
+            low_water = self.max_bytes * 9 // 10
+            entries.sort()
+            for _mtime, _size, _entry in entries:
+                with contextlib.suppress(FileNotFoundError):
+                    _entry.unlink()
+                total -= _size
+                if total <= low_water:
+                    break
+        write_cache_file(path=self.size_path(), data=str(total).encode("utf8"))
+
+
+# audit events that start a process: subprocess, os.system, and the
+# fork sh uses
+SPAWN_AUDIT_EVENTS = frozenset(
+    (
+        "subprocess.Popen",
+        "os.system",
+        "os.fork",
+        "os.forkpty",
+        "os.posix_spawn",
+        "os.spawn",
+    )
+)
+
+
+class StageProfiler:
+    # wall time, CPU time (this process plus its waited-for children) and
+    # the number of processes started, per named stage. Stages are no-ops
+    # until enable(), which installs the audit hook that counts processes.
+    # A process counts for the stages open in the thread that started it,
+    # work handed to another thread takes them along with binding() and
+    # bound(). CPU time is per process, so a stage that overlapped one in
+    # another thread (background post-edit work) also has that stage's CPU
+    # time, the record is marked "concurrent".
+
+    def __init__(self):
+        self.enabled = False
+        self.records: list[dict] = []
+        self.context: dict = {}
+        self._local = threading.local()
+        self._open: list[dict] = []  # the running stages, of all threads
+        self._lock = threading.Lock()
+        self._hooked = False
+
+    def current_context(self) -> dict:
+        context = getattr(self._local, "context", None)
+        return self.context if context is None else context
+
+    def binding(self) -> tuple[dict, tuple[dict, ...]]:
+        # the context and the open stages of the current thread
+        return dict(self.current_context()), getattr(self._local, "stages", ())
+
+    @contextlib.contextmanager
+    def bound(self, binding: tuple[dict, tuple[dict, ...]]):
+        # runs the current thread under binding(), from the thread that
+        # handed the work over: its context in place of self.context, which
+        # follows the file in the editor, and its stages count the processes
+        previous = (
+            getattr(self._local, "context", None),
+            getattr(self._local, "stages", ()),
+        )
+        self._local.context, self._local.stages = binding
+        try:
+            yield
+        finally:
+            self._local.context, self._local.stages = previous
+
+    def enable(self) -> None:
+        if not self._hooked:
+            sys.addaudithook(self._audit)
+            self._hooked = True
+        self.enabled = True
+
+    def _audit(self, event: str, args) -> None:
+        if event in SPAWN_AUDIT_EVENTS:
+            with self._lock:
+                for _stage in getattr(self._local, "stages", ()):
+                    _stage["processes"] += 1
+
+    @staticmethod
+    def cpu_time() -> float:
+        import resource
+
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return time.process_time() + children.ru_utime + children.ru_stime
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        if not self.enabled:
+            yield
+            return
+        current = {"thread": threading.get_ident(), "concurrent": False, "processes": 0}
+        stages = getattr(self._local, "stages", ())
+        self._local.stages = (*stages, current)
+        with self._lock:
+            for _open in self._open:
+                if _open["thread"] != current["thread"]:
+                    _open["concurrent"] = current["concurrent"] = True
+            self._open.append(current)
+        wall_start = time.perf_counter()
+        cpu_start = self.cpu_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = self.cpu_time() - cpu_start
+            self._local.stages = stages
+            with self._lock:
+                self._open = [_open for _open in self._open if _open is not current]
+            self.records.append(
+                {
+                    **self.current_context(),
+                    "stage": name,
+                    "wall": wall,
+                    "cpu": cpu,
+                    "processes": current["processes"],
+                    "concurrent": current["concurrent"],
+                }
+            )
+
+    def report(self, out=sys.stderr) -> None:
+        totals: dict[str, list] = {}
+        for _record in self.records:
+            _total = totals.setdefault(_record["stage"], [0, 0.0, 0.0, 0])
+            _total[0] += 1
+            _total[1] += _record["wall"]
+            _total[2] += _record["cpu"]
+            _total[3] += _record["processes"]
+        print(
+            f"{'stage':<20} {'runs':>5} {'wall ms':>10} {'cpu ms':>10} {'procs':>6}",
+            file=out,
+        )
+        for _name, (_runs, _wall, _cpu, _processes) in totals.items():
+            print(
+                f"{_name:<20} {_runs:>5} {_wall * 1000:>10.1f} {_cpu * 1000:>10.1f} {_processes:>6}",
+                file=out,
+            )
+        if any(_record["concurrent"] for _record in self.records):
+            print(
+                "cpu ms includes the stages that ran at the same time in other threads",
+                file=out,
+            )
 
+    def write_log(self, path: Path, *, command: str) -> None:
+        # one JSON line per run, to follow stage times across releases
+        import importlib.metadata
 
-def append_line_to_readme(*, line: str, readme: Path):
-    with open(readme, "a", encoding="utf8") as fh:
-        fh.write(line)
+        try:
+            version = importlib.metadata.version("edittool")
+        except importlib.metadata.PackageNotFoundError:
+            version = "unknown"
+        line = {
+            "time": time.time(),
+            "command": command,
+            "version": version,
+            "stages": self.records,
+        }
+        with open(path, "a", encoding="utf8") as fh:
+            fh.write(json.dumps(line, default=str) + "\n")
+
+
+PROFILER = StageProfiler()
+
+
+class LockedWriter:
+    # a text file whose writes hold lock, for one live stage writing while
+    # the others print their buffers
+
+    def __init__(self, out, lock: threading.Lock):
+        self.out = out
+        self.lock = lock
+
+    def write(self, text: str) -> int:
+        with self.lock:
+            return self.out.write(text)
+
+    def flush(self) -> None:
+        with self.lock:
+            self.out.flush()
+
+    def isatty(self) -> bool:
+        return self.out.isatty()
+
+
+class StageScheduler:
+    # runs named stages as soon as the stages they come after have finished,
+    # independent stages run concurrently. A stage is called with a text
+    # buffer for its output, which is printed in one piece when the stage
+    # finishes so the output of concurrent stages is not interleaved. One
+    # live stage (lint) writes straight through instead, whole writes at a time.
+    # A stage after a failed stage is skipped, run() re-raises the first
+    # failure (in the order the stages were added), SystemExit included.
+
+    def __init__(self, out=sys.stdout):
+        self.out = out
+        self.stages: dict[str, tuple[Callable, tuple[str, ...], bool]] = {}
+        self._lock = threading.Lock()
+
+    def add(
+        self,
+        name: str,
+        function: Callable,
+        *,
+        after: Sequence[str] = (),
+        live: bool = False,
+    ) -> None:
+        assert name not in self.stages
+        assert not (live and any(_stage[2] for _stage in self.stages.values()))
+        # stages that were not added (a skipped lint, say) are not waited for
+        after = tuple(_name for _name in after if _name in self.stages)
+        self.stages[name] = (function, after, live)
+
+    def _run_stage(
+        self, name: str, function: Callable, live: bool, binding: tuple
+    ) -> None:
+        with PROFILER.bound(binding):
+            self._run_stage_output(name, function, live)
+
+    def _run_stage_output(self, name: str, function: Callable, live: bool) -> None:
+        import io
+
+        if live:
+            try:
+                function(LockedWriter(self.out, self._lock))
+            finally:
+                ic("stage finished:", name)
+            return
+        buffer = io.StringIO()
+        try:
+            function(buffer)
+        finally:
+            with self._lock:
+                self.out.write(buffer.getvalue())
+                self.out.flush()
+            ic("stage finished:", name)
+
+    def run(self) -> None:
+        from concurrent.futures import FIRST_COMPLETED
+        from concurrent.futures import ThreadPoolExecutor
+        from concurrent.futures import wait
+
+        done: set[str] = set()
+        failed: dict[str, BaseException] = {}
+        skipped: set[str] = set()
+        waiting = dict(self.stages)
+        running = {}
+        binding = PROFILER.binding()
+        with ThreadPoolExecutor(max_workers=max(1, len(self.stages))) as executor:
+            while waiting or running:
+                for _name, (_function, _after, _live) in list(waiting.items()):
+                    if any(
+                        _dependency in failed or _dependency in skipped
+                        for _dependency in _after
+                    ):
+                        ic("stage skipped:", _name)
+                        skipped.add(_name)
+                        del waiting[_name]
+                    elif all(_dependency in done for _dependency in _after):
+                        running[
+                            executor.submit(
+                                self._run_stage, _name, _function, _live, binding
+                            )
+                        ] = _name
+                        del waiting[_name]
+                if not running:
+                    continue
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for _future in finished:
+                    _name = running.pop(_future)
+                    if _future.exception() is not None:
+                        failed[_name] = _future.exception()
+                    else:
+                        done.add(_name)
+        for _name in self.stages:
+            if _name in failed:
+                raise failed[_name]
+
+
+@contextlib.contextmanager
+def profiling(*, command: str, profile: bool, profile_log: Path | None):
+    # --profile prints the stage table, --profile-log appends a JSON line,
+    # also when the command exits early
+    if not (profile or profile_log):
+        yield
+        return
+    PROFILER.enable()
+    try:
+        yield
+    finally:
+        if profile:
+            PROFILER.report()
+        if profile_log:
+            PROFILER.write_log(profile_log, command=command)
 
 
-def tty_capture(cmd, bytes_input):
+def tty_capture(
+    cmd,
+    bytes_input,
+    *,
+    max_bytes: int | None = None,
+    on_output: Callable[[str, bytes], None] | None = None,
+    read_size: int = 65536,
+):
     """Capture the output of cmd with bytes_input to stdin,
     with stdin, stdout and stderr as TTYs.
 
+    max_bytes caps what is kept of each stream (the rest is still read
+    so cmd does not block). on_output(stream_name, data) is called with
+    each chunk as it arrives, where stream_name is "stdout" or "stderr".
+
     Based on Andy Hayden's gist:
     https://gist.github.com/hayd/4f46a68fc697ba8888a7b517a414583e
     """
@@ -106,109 +657,683 @@ def tty_capture(cmd, bytes_input):
         os.close(fd)
     os.write(mi, bytes_input)
 
-    timeout = 0.04  # seconds
-    readable = [mo, me]
-    result = {mo: b"", me: b""}
+    names = {mo: "stdout", me: "stderr"}
+    chunks: dict[int, list[bytes]] = {mo: [], me: []}
+    kept = {mo: 0, me: 0}
+    selector = selectors.DefaultSelector()
+    for fd in names:
+        selector.register(fd, selectors.EVENT_READ)
     try:
-        while readable:
-            ready, _, _ = select.select(readable, [], [], timeout)
-            for fd in ready:
+        while selector.get_map():
+            for key, _ in selector.select():
+                fd = key.fd
                 try:
-                    data = os.read(fd, 512)
+                    data = os.read(fd, read_size)
                 except OSError as e:
                     if e.errno != errno.EIO:
                         raise
                     # EIO means EOF on some systems
-                    readable.remove(fd)
-                else:
-                    if not data:  # EOF
-                        readable.remove(fd)
-                    result[fd] += data
+                    data = b""
+                if not data:  # EOF
+                    selector.unregister(fd)
+                    continue
+                if on_output is not None:
+                    on_output(names[fd], data)
+                if max_bytes is not None:
+                    data = data[: max(0, max_bytes - kept[fd])]
+                if data:
+                    chunks[fd].append(data)
+                    kept[fd] += len(data)
 
     finally:
+        selector.close()
         for fd in [mo, me, mi]:
             os.close(fd)
         if p.poll() is None:
             p.kill()
         p.wait()
 
-    return result[mo], result[me]
+    return b"".join(chunks[mo]), b"".join(chunks[me])
 
 
 # out, err = tty_capture(["python", "test.py"], b"abc\n")
 # print((out, err))
 
 
-def parse_sh_var(*, item, var_name):
-    if f'{var_name}="' in item:
-        result = item.split("=")[-1].strip('"').strip("'")
-        return result
+@dataclass(frozen=True, slots=True)
+class EditConfig:
+    path: Path
+    short_package: str | None = None
+    group: str | None = None
+    remote: str | None = None
+    test_command_arg: str | None = None
+    dont_reformat: bool = False
+    install_command: str | None = None
+    skip_test: bool = False
+
+
+EDIT_CONFIG_STRINGS = (
+    "short_package",
+    "group",
+    "remote",
+    "test_command_arg",
+    "install_command",
+)
+EDIT_CONFIG_BOOLEANS = (
+    "dont_reformat",
+    "skip_test",
+)
+EDIT_CONFIG_KEYS = frozenset(EDIT_CONFIG_STRINGS + EDIT_CONFIG_BOOLEANS)
+EDIT_CONFIG_FALSE = ("0", "false", "no", "off")
 
 
-def parse_edit_config(
+def parse_edit_config_text(
     *,
+    text: str,
     path: Path,
-):
+) -> EditConfig:
+    # one pass over sh style key="value" lines, the first non-empty value
+    # of a key wins, values may contain '='
+    values: dict[str, str] = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("export "):
+            line = line[len("export ") :].lstrip()
+        key, sep, value = line.partition("=")
+        if not sep or key not in EDIT_CONFIG_KEYS or values.get(key):
+            continue
+        value = value.strip()
+        if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+            value = value[1:-1]
+        values[key] = value
+
+    return EditConfig(
+        path,
+        **{_key: values.get(_key) or None for _key in EDIT_CONFIG_STRINGS},
+        **{
+            _key: bool(values.get(_key))
+            and values[_key].lower() not in EDIT_CONFIG_FALSE
+            for _key in EDIT_CONFIG_BOOLEANS
+        },
+    )
+
+
+# per process: directory -> .edit_config found walking up from it, and
+# .edit_config -> (st_mtime_ns, parsed), re-parsed when the mtime changes
+_EDIT_CONFIG_PATHS: dict[Path, Path] = {}
+_EDIT_CONFIGS: dict[Path, tuple[int, EditConfig]] = {}
+
+
+def find_edit_config(directory: Path) -> Path:
+    from walkup_until_found import walkup_until_found
+
+    try:
+        edit_config = _EDIT_CONFIG_PATHS[directory]
+        if edit_config.is_file():
+            return edit_config
+    except KeyError:
+        pass
     edit_config = walkup_until_found(
-        path=path.parent,
+        path=directory,
         name=".edit_config",
     )
+    _EDIT_CONFIG_PATHS[directory] = edit_config
+    return edit_config
+
+
+def parse_edit_config(
+    *,
+    path: Path,
+) -> EditConfig:
+    edit_config = find_edit_config(path.parent)
     # ic(edit_config)
+    mtime_ns = edit_config.stat().st_mtime_ns
+    try:
+        cached_mtime_ns, config = _EDIT_CONFIGS[edit_config]
+        if cached_mtime_ns == mtime_ns:
+            return config
+    except KeyError:
+        pass
+    config = parse_edit_config_file(edit_config)
+    _EDIT_CONFIGS[edit_config] = (mtime_ns, config)
+    return config
 
+
+def parse_edit_config_file(edit_config: Path) -> EditConfig:
     with open(edit_config, "r", encoding="utf8") as fh:
-        edit_config_content = fh.read()
-
-    # ic(edit_config_content)
-    edit_config_content_list = edit_config_content.splitlines()
-    # ic(edit_config_content)
-    short_package = None
-    group = None
-    remote = None
-    test_command_arg = None
-    dont_reformat = None
-    install_command = None
-    skip_test = None
-    for item in edit_config_content_list:
-        # ic(item)
-        if not short_package:
-            short_package = parse_sh_var(item=item, var_name="short_package")
-        if not group:
-            group = parse_sh_var(item=item, var_name="group")
-        if not remote:
-            remote = parse_sh_var(item=item, var_name="remote")
-        if not test_command_arg:
-            test_command_arg = parse_sh_var(item=item, var_name="test_command_arg")
-        if not dont_reformat:
-            dont_reformat = parse_sh_var(item=item, var_name="dont_reformat")
-        if not install_command:
-            install_command = parse_sh_var(item=item, var_name="install_command")
-        if not skip_test:
-            skip_test = parse_sh_var(item=item, var_name="skip_test")
-
-    ic(short_package)
-    ic(group)
-    ic(remote)
-    ic(test_command_arg)
-    ic(dont_reformat)
-    ic(install_command)
-    ic(skip_test)
-
-    return (
-        edit_config,
-        short_package,
-        group,
-        remote,
-        test_command_arg,
-        dont_reformat,
-        install_command,
-        skip_test,
+        config = parse_edit_config_text(text=fh.read(), path=edit_config)
+    ic(config)
+    return config
+
+
+class GitSession:
+    # the git commands for one edit. status() is a single
+    # `git status --porcelain -z` snapshot that answers every "is this
+    # dirty/staged" question until a command that changes the index or
+    # HEAD invalidates it. process_count is the number of git processes run.
+
+    def __init__(self, *, cwd: Path):
+        self.cwd = cwd
+        self.process_count = 0
+        self._status: dict[str, str] | None = None
+        self._toplevel: Path | None = None
+
+    def run(self, *args: str, show: bool = False) -> bytes:
+        # show=True sends the output to the terminal instead of returning it
+        ic(args)
+        self.process_count += 1
+        output = None if show else subprocess.PIPE
+        result = subprocess.run(
+            ["git", *args],
+            cwd=self.cwd,
+            stdout=output,
+            stderr=output,
+            check=False,
+        )
+        if result.returncode != 0:
+            raise subprocess.CalledProcessError(
+                result.returncode,
+                ["git", *args],
+                output=result.stdout,
+                stderr=result.stderr,
+            )
+        return result.stdout or b""
+
+    @property
+    def toplevel(self) -> Path:
+        # found without running git: the nearest parent with a .git entry
+        if self._toplevel is None:
+            for _folder in (self.cwd, *self.cwd.parents):
+                if (_folder / Path(".git")).exists():
+                    self._toplevel = _folder
+                    break
+            else:
+                raise FileNotFoundError(f"no git repository above {self.cwd}")
+        return self._toplevel
+
+    def relative(self, path: Path) -> str:
+        return path.resolve().relative_to(self.toplevel.resolve()).as_posix()
+
+    def status(self) -> dict[str, str]:
+        # toplevel relative path -> porcelain XY
+        if self._status is None:
+            output = self.run("status", "--porcelain=v1", "-z")
+            self._status = {}
+            entries = iter(output.split(b"\0"))
+            for _entry in entries:
+                if not _entry:
+                    continue
+                _xy = _entry[:2].decode("utf8")
+                self._status[os.fsdecode(_entry[3:])] = _xy
+                if _xy[0] in "RC":  # followed by the source path
+                    next(entries, None)
+        return self._status
+
+    def invalidate(self) -> None:
+        self._status = None
+
+    def unstaged_changes(self, path: Path) -> bool:
+        # same question as gittool.unstaged_commits_exist()
+        return self.status().get(self.relative(path), "  ")[1] in "MDT"
+
+    def untracked(self, path: Path) -> bool:
+        relative = self.relative(path)
+        for _path, _xy in self.status().items():
+            if _xy == "??" and (
+                _path == relative
+                or (_path.endswith("/") and relative.startswith(_path))
+            ):
+                return True
+        return False
+
+    def staged_changes(self) -> bool:
+        return any(_xy[0] not in " ?!" for _xy in self.status().values())
+
+    def add(self, *args: str) -> None:
+        self.run("add", *args)
+        self.invalidate()
+
+    def add_updated(self, path: Path) -> None:
+        # `git add path` + `git add -u`, path only needs its own add if untracked
+        if self.untracked(path):
+            self.add("--", path.as_posix())
+        self.add("-u")
+
+    def commit(self, *args: str, show: bool = False) -> None:
+        self.run("commit", *args, show=show)
+        self.invalidate()
+
+
+class Inotify:
+    # the few inotify(7) calls watch mode needs, through libc
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    event_header = struct.Struct("iIII")
+
+    def __init__(self):
+        import ctypes
+        import ctypes.util
+
+        self._libc = ctypes.CDLL(
+            ctypes.util.find_library("c") or "libc.so.6",
+            use_errno=True,
+        )
+        self._get_errno = ctypes.get_errno
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        self._check(self.fd)
+
+    def _check(self, result: int) -> int:
+        if result < 0:
+            _errno = self._get_errno()
+            raise OSError(_errno, os.strerror(_errno))
+        return result
+
+    def add_watch(self, path: Path, mask: int) -> int:
+        return self._check(
+            self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        )
+
+    def read(self) -> list[tuple[int, int, str]]:
+        # (wd, mask, name) for each queued event
+        try:
+            data = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _cookie, length = self.event_header.unpack_from(data, offset)
+            offset += self.event_header.size
+            name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+            events.append((wd, mask, os.fsdecode(name)))
+        return events
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class PipelineWatcher:
+    # calls process(path) in a background thread for each file in folder
+    # with one of suffixes that is written, once debounce seconds have
+    # passed without another write to it. Editors that save by renaming a
+    # temporary file over the original are covered by IN_MOVED_TO.
+
+    def __init__(
+        self,
+        *,
+        folder: Path,
+        process: Callable[[Path], None],
+        suffixes: Sequence[str] = (".py",),
+        debounce: float = 0.3,
+    ):
+        self.folder = folder
+        self.process = process
+        self.suffixes = tuple(suffixes)
+        self.debounce = debounce
+        self.processed: list[Path] = []
+        self._inotify = Inotify()
+        self._inotify.add_watch(folder, Inotify.IN_CLOSE_WRITE | Inotify.IN_MOVED_TO)
+        self._wake_read, self._wake_write = os.pipe()
+        self._thread = threading.Thread(
+            target=self._run, name="edittool-watch", daemon=True
+        )
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        # lets a run that already started finish, pending writes are left
+        # to the normal post-edit pipeline
+        os.write(self._wake_write, b"\0")
+        self._thread.join()
+        self._inotify.close()
+        os.close(self._wake_read)
+        os.close(self._wake_write)
+
+    def _run(self) -> None:
+        pending: dict[Path, float] = {}
+        with selectors.DefaultSelector() as selector:
+            selector.register(self._inotify.fd, selectors.EVENT_READ)
+            selector.register(self._wake_read, selectors.EVENT_READ)
+            while True:
+                timeout = None
+                if pending:
+                    timeout = max(0.0, min(pending.values()) - time.monotonic())
+                for key, _ in selector.select(timeout):
+                    if key.fd == self._wake_read:
+                        return
+                    for _wd, _mask, _name in self._inotify.read():
+                        if _name.startswith(".") or not _name.endswith(self.suffixes):
+                            continue
+                        pending[self.folder / Path(_name)] = (
+                            time.monotonic() + self.debounce
+                        )
+                now = time.monotonic()
+                for _path in [_path for _path, _due in pending.items() if _due <= now]:
+                    del pending[_path]
+                    try:
+                        self.process(_path)
+                        self.processed.append(_path)
+                    except Exception as e:  # pylint: disable=broad-except
+                        ic(_path, e)
+
+
+def precompute_python(
+    path: Path,
+    *,
+    skip_black: bool,
+    skip_isort: bool,
+    skip_pylint: bool,
+    cwd: Path,
+) -> None:
+    # fills the format and pylint caches for the current content of path,
+    # without touching the file, so the post-edit stages are cache hits
+    source = path.read_bytes()
+    result = format_python_source(
+        source=source,
+        path=path,
+        skip_black=skip_black,
+        skip_isort=skip_isort,
+        skip_text_replace=True,
     )
+    if not skip_pylint:
+        lint_python_source(
+            path=path,
+            source=result,
+            from_stdin=True,
+            cwd=cwd,
+        )
+
+
+def stat_key(path: Path) -> tuple[int, int, int]:
+    _stat = path.stat()
+    return (_stat.st_ino, _stat.st_size, _stat.st_mtime_ns)
+
+
+class ChangeDetector:
+    # did path change across the editor session? (st_ino, st_size,
+    # st_mtime_ns) settles it when identical or when the size differs,
+    # the content is only hashed when the stat data is ambiguous, or when
+    # the first stat was taken within the mtime granularity of the last
+    # write ("racy", as git calls it). Results are memoized for the run.
+
+    racy_ns = 2_000_000_000
+
+    def __init__(
+        self,
+        *,
+        path: Path,
+        data: bytes | None = None,
+        digest: bytes | None = None,
+    ):
+        self.path = path
+        self.before_stat = self.stat_key()
+        self.before_data = path.read_bytes() if data is None else data
+        self.before_digest = digest  # of data, when it was hashed ahead
+        self.racy = time.time_ns() - self.before_stat[2] < self.racy_ns
+        self.after_data: bytes | None = None
+        self._changed: bool | None = None
+        self._unstaged_changes: bool | None = None
+
+    def stat_key(self) -> tuple[int, int, int]:
+        return stat_key(self.path)
+
+    def changed(self) -> bool:
+        if self._changed is None:
+            after_stat = self.stat_key()
+            if after_stat == self.before_stat and not self.racy:
+                self._changed = False
+            elif after_stat[1] != self.before_stat[1]:
+                self._changed = True
+            else:
+                self.after_data = self.path.read_bytes()
+                if self.before_digest is None:
+                    self.before_digest = hashlib.sha3_256(self.before_data).digest()
+                self._changed = (
+                    self.before_digest != hashlib.sha3_256(self.after_data).digest()
+                )
+            ic(self.before_stat, after_stat, self.racy, self._changed)
+        return self._changed
+
+    def unstaged_changes(self, git: GitSession) -> bool:
+        if self._unstaged_changes is None:
+            self._unstaged_changes = git.unstaged_changes(self.path)
+        return self._unstaged_changes
+
+
+README_COMMENT = """<!--- NOTE! THIS FILE IS AUTOMATICALLY GENERATED, IF YOU ARE READING THIS, YOU ARE EDITING THE WRONG FILE --->\n"""
+
+
+@dataclass(frozen=True, slots=True)
+class ReadmeExample:
+    # one line of .autogenerate_readme.sh: the text written before its
+    # output, and the shell command to run (None for comments).
+    # serial examples do not run concurrently with any other example
+    header: str
+    command: str | None
+    tty: bool = False
+    serial: bool = False
+
+
+def parse_readme_script(commands: Sequence[str]) -> list[ReadmeExample]:
+    # "#tty:" and "#serial:" apply to the command on the next line
+    examples = []
+    tty = False
+    serial = False
+    for command in commands:
+        if command == "#tty:":
+            tty = True
+            continue
+        if command == "#serial:":
+            serial = True
+            continue
+        if tty:
+            examples.append(
+                ReadmeExample(f"\n$ {command}\n", command, tty=True, serial=True)
+            )
+        elif command == "# <br>":
+            examples.append(ReadmeExample("\n", None))
+        elif command.startswith("#"):
+            examples.append(ReadmeExample(f"\n$ {command}", None))
+        else:
+            examples.append(ReadmeExample(f"\n$ {command}\n", command, serial=serial))
+        tty = False
+        serial = False
+    return examples
+
+
+def run_readme_example(example: ReadmeExample) -> bytes:
+    if example.command is None:
+        return b""
+    if example.tty:
+        # colorpipe needs to be inserted after the last |
+        _command_split = example.command.split("|")
+        _command_split[-1] = "colorpipe " + _command_split[-1]
+        _command = " | ".join(_command_split)
+        ic(_command)
+        # stderr goes to the terminal
+        popen_result = subprocess.run(_command, stdout=subprocess.PIPE, shell=True)
+    else:
+        popen_result = subprocess.run(
+            example.command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            shell=True,
+        )
+    ic(example.command, popen_result.returncode)
+    return popen_result.stdout
+
+
+def installed_package_version(*, group: str, short_package: str) -> str:
+    # the installed versions of group/short_package in the portage vdb,
+    # with their BUILD_TIME so a reinstall of a live ebuild counts as a change
+    vdb = Path("/var/db/pkg") / Path(group)
+    versions = []
+    for _package in sorted(vdb.glob(f"{short_package}-[0-9]*")):
+        try:
+            build_time = (_package / Path("BUILD_TIME")).read_text().strip()
+        except OSError:
+            build_time = ""
+        versions.append(f"{_package.name}:{build_time}")
+    return " ".join(versions)
+
+
+def project_source_hash(project_folder: Path) -> str | None:
+    # hash of the tracked and untracked (not ignored) files, except README.md
+    # which is the output. None if this is not a git checkout.
+    try:
+        ls_files = subprocess.run(
+            ["git", "ls-files", "-z", "--cached", "--others", "--exclude-standard"],
+            cwd=project_folder,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            check=True,
+        ).stdout
+    except (subprocess.CalledProcessError, FileNotFoundError) as e:
+        ic(e)
+        return None
+    _hash = hashlib.sha3_256()
+    for _name in sorted(set(ls_files.split(b"\0"))):
+        if not _name or _name == b"README.md":
+            continue
+        try:
+            _data = (project_folder / Path(os.fsdecode(_name))).read_bytes()
+        except (FileNotFoundError, IsADirectoryError):  # deleted, or a submodule
+            _data = b""
+        _hash.update(ResultCache.key(_name, _data).encode("utf8"))
+    return _hash.hexdigest()
+
+
+def run_readme_example_cached(
+    example: ReadmeExample,
+    *,
+    cache: ResultCache,
+    context: str,
+    refresh: bool,
+) -> bytes:
+    cache_key = cache.key(context, example.command or "", str(example.tty))
+    output = None if refresh else cache.get(cache_key)
+    if output is None:
+        output = run_readme_example(example)
+        cache.put(cache_key, output)
+    else:
+        ic("README example output from cache:", example.command)
+    return output
+
+
+def run_readme_examples(
+    examples: Sequence[ReadmeExample],
+    *,
+    jobs: int,
+    runner: Callable[[ReadmeExample], bytes] = run_readme_example,
+) -> list[bytes]:
+    # up to jobs examples run at once, a serial example waits for the ones
+    # before it and blocks the ones after it. Outputs are in input order.
+    from concurrent.futures import ThreadPoolExecutor
+
+    # the processes of the examples count for the readme_examples stage
+    binding = PROFILER.binding()
+
+    def run(example: ReadmeExample) -> bytes:
+        with PROFILER.bound(binding):
+            return runner(example)
+
+    outputs = [b""] * len(examples)
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        pending = {}
+        for index, example in enumerate(examples):
+            if example.command is None:
+                continue
+            if example.serial:
+                for _index, _future in pending.items():
+                    outputs[_index] = _future.result()
+                pending = {}
+                outputs[index] = runner(example)
+                continue
+            pending[index] = executor.submit(run, example)
+        for _index, _future in pending.items():
+            outputs[_index] = _future.result()
+    return outputs
+
+
+def assemble_readme(
+    *,
+    autogenerate_readme_script: Path,
+    out: BinaryIO,
+    jobs: int | None = None,
+    runner: Callable[[ReadmeExample], bytes] = run_readme_example,
+) -> None:
+    readme_folder = autogenerate_readme_script.parent
+    with open(autogenerate_readme_script, "r", encoding="utf8") as fh:
+        commands = [cmd.strip() for cmd in fh if cmd.strip()]
+    ic(commands)
+
+    description_md = readme_folder / Path(".description.md")
+    ic(description_md)
+    install_md = readme_folder / Path(".install.md")
+    ic(install_md)
+
+    out.write(README_COMMENT.encode("utf8"))
+    for _part in (description_md, install_md):
+        with open(_part, "rb") as fh:
+            shutil.copyfileobj(fh, out)
+    out.write(b"### Examples:\n")
+    out.write(b"```")
+
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    examples = parse_readme_script(commands[1:])
+    outputs = run_readme_examples(examples, jobs=jobs, runner=runner)
+    for example, output in zip(examples, outputs):
+        out.write(example.header.encode("utf8"))
+        out.write(output)
+
+    out.write(b"\n```\n")
+
+
+def postprocess_readme(
+    *,
+    readme_folder: Path,
+    readme_file: Path,
+    work_folder: Path,
+) -> Path:
+    # each script reads the previous file on stdin and writes the next one
+    # from stdout, the data does not pass through this process
+    _postprocess_readme_script = readme_folder / Path(".postprocess_readme.sh")
+    ic(_postprocess_readme_script)
+    _validate_readme_script = readme_folder / Path(".validate_readme.sh")
+    ic(_validate_readme_script)
+
+    for _script in (_postprocess_readme_script, _validate_readme_script):
+        if not _script.exists():
+            continue
+        _output_file = work_folder / Path(_script.stem)
+        with open(readme_file, "rb") as fh_in, open(_output_file, "wb") as fh_out:
+            subprocess.run([_script.as_posix()], stdin=fh_in, stdout=fh_out, check=True)
+        readme_file = _output_file
+    return readme_file
 
 
 def autogenerate_readme(
     *,
     path: Path,
+    config: EditConfig | None = None,
+    jobs: int | None = None,
+    use_cache: bool = True,
+    refresh_examples: bool = False,
+    git: GitSession | None = None,
 ):
+    import filecmp
+    import tempfile
+
+    from portagetool import package_atom_installed
+    from walkup_until_found import walkup_until_found
+
     try:
         autogenerate_readme_script = walkup_until_found(
             path=path.parent,
@@ -218,175 +1343,660 @@ def autogenerate_readme(
         ic(e)
         return
 
-    (
-        edit_config,
-        short_package,
-        group,
-        remote,
-        test_command_arg,
-        dont_reformat,
-        install_command,
-        skip_test,
-    ) = parse_edit_config(
-        path=path,
-    )
+    if config is None:
+        config = parse_edit_config(
+            path=path,
+        )
 
-    package_atom = f"{group}/{short_package}"
+    package_atom = f"{config.group}/{config.short_package}"
     if not package_atom_installed(package_atom):
         return
 
-    with open(autogenerate_readme_script, "r", encoding="utf8") as fh:
-        commands = [cmd.strip() for cmd in fh if cmd.strip()]
-    ic(commands)
-
-    readme_comment = (
-        """<!--- NOTE! THIS FILE IS AUTOMATICALLY GENERATED, IF YOU ARE READING THIS, YOU ARE EDITING THE WRONG FILE --->"""
-        + "\n"
-    )
-
     readme_md = autogenerate_readme_script.parent / Path("README.md")
     ic(readme_md)
 
-    description_md = autogenerate_readme_script.parent / Path(".description.md")
-    ic(description_md)
+    # example outputs are reused while the command, the installed package
+    # and the project sources are unchanged
+    runner = run_readme_example
+    source_hash = project_source_hash(autogenerate_readme_script.parent)
+    if use_cache and source_hash:
+        runner = functools.partial(
+            run_readme_example_cached,
+            cache=ResultCache(namespace="readme"),
+            context="\n".join(
+                (
+                    installed_package_version(
+                        group=config.group,
+                        short_package=config.short_package,
+                    ),
+                    source_hash,
+                )
+            ),
+            refresh=refresh_examples,
+        )
 
-    install_md = autogenerate_readme_script.parent / Path(".install.md")
-    ic(install_md)
+    # the README is assembled and post-processed in files outside the
+    # project, README.md is only replaced if the result differs
+    with tempfile.TemporaryDirectory(prefix="edittool-readme-") as _work_folder:
+        work_folder = Path(_work_folder)
+        readme_file = work_folder / Path("README.md")
+        with PROFILER.stage("readme_examples"):
+            with open(readme_file, "wb") as fh:
+                assemble_readme(
+                    autogenerate_readme_script=autogenerate_readme_script,
+                    out=fh,
+                    jobs=jobs,
+                    runner=runner,
+                )
+        with PROFILER.stage("readme_postprocess"):
+            readme_file = postprocess_readme(
+                readme_folder=autogenerate_readme_script.parent,
+                readme_file=readme_file,
+                work_folder=work_folder,
+            )
+
+        readme_changed = not (
+            readme_md.exists() and filecmp.cmp(readme_file, readme_md, shallow=False)
+        )
+        if readme_changed:
+            with open(readme_file, "rb") as fh_in, atomic_output(readme_md) as fh_out:
+                shutil.copyfileobj(fh_in, fh_out)
+        else:
+            ic("README.md is unchanged")
 
-    _postprocess_readme_script = autogenerate_readme_script.parent / Path(
-        ".postprocess_readme.sh"
+    if git is None:
+        git = GitSession(cwd=readme_md.parent)
+    # a rewritten README.md has unstaged changes, otherwise ask the snapshot
+    if readme_changed or git.unstaged_changes(readme_md):
+        git.add("--", readme_md.as_posix())
+        # sh.git.commit("-m", "autoupdate README.md")
+
+    return
+
+
+def pylint_cache_key(
+    *, path: Path, source: bytes, cwd: Path, dependencies: str | None
+) -> str:
+    # dependencies is the hash of the project modules path imports, pylint's
+    # import and member checks (E0401, E0611, E1101) depend on them
+    return ResultCache.key(
+        path.as_posix(),
+        source,
+        cwd.as_posix(),
+        module_fingerprint("pylint"),
+        config_fingerprint(path=path, names=PYLINT_CONFIG_FILES),
+        dependencies or "",
     )
-    ic(_postprocess_readme_script)
-    _validate_readme_script = autogenerate_readme_script.parent / Path(
-        ".validate_readme.sh"
+
+
+def lint_python_source(
+    *,
+    path: Path,
+    source: bytes,
+    use_cache: bool = True,
+    from_stdin: bool = False,
+    cwd: Path | None = None,
+    dependencies: str | None = None,
+    on_line: Callable[[bytes], None] | None = None,
+) -> tuple[int, bytes]:
+    # pylint's exit code and output for path with the content source, from
+    # the cache if possible. from_stdin lints source when it is not what is
+    # on disk (pylint --from-stdin), the result is the same either way.
+    # dependencies is lint_dependency_hash(), computed when not given, the
+    # result is not cached outside a git project.
+    if cwd is None:
+        cwd = Path(os.getcwd())
+    if use_cache and dependencies is None:
+        dependencies = lint_dependency_hash(path=path, source=source)
+        use_cache = dependencies is not None
+    cache = ResultCache(namespace="pylint", enabled=use_cache)
+    cache_key = pylint_cache_key(
+        path=path, source=source, cwd=cwd, dependencies=dependencies
     )
-    ic(_validate_readme_script)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        cached_result = json.loads(cached)
+        ic("pylint result from cache:", path, cached_result["exit_code"])
+        pylint_output = cached_result["output"].encode("utf8")
+        if on_line is not None:
+            for _line in pylint_output.splitlines(keepends=True):
+                on_line(_line)
+        return cached_result["exit_code"], pylint_output
+
+    # lines are passed to on_line as pylint writes them
+    pylint_args = ["--from-stdin", path.as_posix()] if from_stdin else [path.as_posix()]
+    chunks = []
+    with subprocess.Popen(
+        ["pylint", *pylint_args],
+        cwd=cwd,
+        stdin=subprocess.PIPE if from_stdin else subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+    ) as proc:
+        if from_stdin:
+            proc.stdin.write(source)
+            proc.stdin.close()
+        for _line in proc.stdout:
+            chunks.append(_line)
+            if on_line is not None:
+                on_line(_line)
+        exit_code = proc.wait()
+    pylint_output = b"".join(chunks)
+    # fatal messages and usage errors are not a property of the file
+    if not exit_code & 0b100001:
+        cached_result = {
+            "exit_code": exit_code,
+            "output": pylint_output.decode("utf8", errors="replace"),
+        }
+        cache.put(cache_key, json.dumps(cached_result).encode("utf8"))
+    return exit_code, pylint_output
+
+
+PYLINT_CATEGORIES = {
+    "F": "fatal",
+    "E": "error",
+    "W": "warning",
+    "R": "refactor",
+    "C": "convention",
+    "I": "info",
+}
+
+
+class PylintOutput:
+    # writes pylint output lines to out as they arrive, error (": E") lines
+    # in red when out is a terminal, and counts the messages per category
+    # for summary()
+
+    def __init__(self, *, out=sys.stdout, color: bool | None = None):
+        import re
+
+        self.out = out
+        if color is None:
+            color = out.isatty()
+        self.color = color
+        self.counts = dict.fromkeys(PYLINT_CATEGORIES.values(), 0)
+        self._message = re.compile(r"^.+?:\d+:\d+: ([A-Z])\d{4}: ")
+
+    def write_line(self, line: bytes) -> None:
+        text = line.decode("utf8", errors="replace")
+        match = self._message.match(text)
+        if match and match.group(1) in PYLINT_CATEGORIES:
+            self.counts[PYLINT_CATEGORIES[match.group(1)]] += 1
+        if self.color and ": E" in text:
+            text = f"\x1b[01;31m{text.rstrip(chr(10))}\x1b[m\n"
+        self.out.write(text)
+        self.out.flush()
+
+    def summary(self, **fields) -> str:
+        # one JSON line, fields first
+        return json.dumps({**fields, "messages": self.counts})
+
+
+def run_pylint(
+    *,
+    path: Path,
+    ignore_pylint: bool,
+    use_cache: bool = True,
+    out=sys.stdout,
+    summary=None,
+):
+    # summary is a text file for a JSON line of message counts
+    output = PylintOutput(out=out)
+    with PROFILER.stage("pylint"):
+        exit_code, _ = lint_python_source(
+            path=path,
+            source=path.read_bytes(),
+            use_cache=use_cache,
+            on_line=output.write_line,
+        )
+    if summary is not None:
+        summary.write(output.summary(path=path.as_posix(), exit_code=exit_code) + "\n")
+        summary.flush()
+    if exit_code:
+        ic(exit_code)
+        if (exit_code & 0b00011) > 0:
+            ic("pylint returned an error or worse, exiting")
+            if not ignore_pylint:
+                sys.exit(exit_code)
+
+
+def module_names(relative: Path) -> list[str]:
+    # the names a project file can be imported as: a/b/c.py is a.b.c, b.c
+    # or c depending on which directory is on sys.path (src/ layouts)
+    parts = list(relative.with_suffix("").parts)
+    if parts[-1] == "__init__":
+        parts.pop()
+    return [".".join(parts[_index:]) for _index in range(len(parts))]
+
+
+def imported_modules(*, source: bytes, name: str, is_package: bool) -> set[str]:
+    # module names imported by source, relative imports resolved against
+    # name (the dotted name of the file itself). "from a import b" gives
+    # both a and a.b, b might be a module or a name in a.
+    import ast
 
     try:
-        readme_md.unlink()
-    except FileNotFoundError:
-        pass
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return set()
+    package = name.split(".") if is_package else name.split(".")[:-1]
+    result = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            result.update(_alias.name for _alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            base = node.module or ""
+            if node.level:
+                _parent = package[: len(package) - (node.level - 1)]
+                base = ".".join(_parent + ([base] if base else []))
+            if base:
+                result.add(base)
+            result.update(
+                f"{base}.{_alias.name}" if base else _alias.name
+                for _alias in node.names
+            )
+    return result
 
-    with open(description_md, "r", encoding="utf8") as fh:
-        append_line_to_readme(line=readme_comment, readme=readme_md)
-        append_line_to_readme(line=fh.read(), readme=readme_md)
 
-    with open(install_md, "r", encoding="utf8") as fh:
-        append_line_to_readme(line=fh.read(), readme=readme_md)
+def project_python_files(git: GitSession, *, untracked: bool = False) -> list[Path]:
+    # the .py files of the project, tracked ones and with untracked also
+    # the untracked (not ignored) ones, that exist
+    toplevel = git.toplevel.resolve()
+    others = ("--others", "--exclude-standard") if untracked else ()
+    ls_files = git.run(
+        "ls-files", "-z", "--full-name", "--cached", *others, "--", ":(top)*.py"
+    )
+    paths = [
+        toplevel / Path(os.fsdecode(_name)) for _name in ls_files.split(b"\0") if _name
+    ]
+    return list(dict.fromkeys(_path for _path in paths if _path.is_file()))
+
+
+def project_module_index(*, toplevel: Path, paths: list[Path]) -> dict[str, Path]:
+    by_name: dict[str, Path] = {}
+    # a file nearer the toplevel wins a name it shares with a deeper one
+    for _path in sorted(paths, key=lambda _path: len(_path.parts)):
+        for _name in module_names(_path.relative_to(toplevel)):
+            by_name.setdefault(_name, _path)
+    return by_name
+
+
+def project_imports(
+    *, toplevel: Path, by_name: dict[str, Path], path: Path, source: bytes
+) -> set[Path]:
+    # the project files path imports directly
+    relative = path.relative_to(toplevel)
+    names = imported_modules(
+        source=source,
+        name=module_names(relative)[0],
+        is_package=relative.name == "__init__.py",
+    )
+    return {by_name[_name] for _name in names if _name in by_name} - {path}
 
-    append_line_to_readme(line="### Examples:\n", readme=readme_md)
-    # append_line_to_readme(line=f"```\n$ {short_package}\n", readme=readme_md)
-    append_line_to_readme(line="```", readme=readme_md)
 
-    # test_command = sh.Command(short_package)
-    # ic(test_command)
-    # test_command = test_command.bake(test_command_arg)
-    # ic(test_command)
-    # with open(readme_md, "a", encoding="utf8") as fh:
-    #    test_command(_err=fh, _ok_code=[0, 1])
+def dependency_key(*, toplevel: Path, sources: dict[Path, bytes]) -> str:
+    return ResultCache.key(
+        *(
+            f"{_path.relative_to(toplevel).as_posix()}:{hashlib.sha3_256(sources[_path]).hexdigest()}"
+            for _path in sorted(sources)
+        )
+    )
 
-    tty = False
-    for command in commands[1:]:
-        ic(command)
-        if tty:
-            # out, err = tty_capture(command, b'')
-            append_line_to_readme(line=f"\n$ {command}\n", readme=readme_md)
-            ic(command)
-
-            # colorpipe needs to be inserted after the last |
-            _command_split = command.split("|")
-            ic(_command_split)
-            _command_split[-1] = "colorpipe " + _command_split[-1]
-            ic(_command_split)
-            _command = " | ".join(_command_split)
-            ic(_command)
-            # os.system("colorpipe " + command + " >> " + readme.as_posix())
-            os.system(_command + " >> " + readme_md.as_posix())
-
-            tty = False
-            # ic(out, err)
+
+def lint_dependency_hashes(
+    *, toplevel: Path, sources: dict[Path, bytes]
+) -> dict[Path, str]:
+    # for each project file, a hash of the project files it imports,
+    # directly or through other project files
+    paths = list(sources)
+    by_name = project_module_index(toplevel=toplevel, paths=paths)
+    imports = {
+        _path: project_imports(
+            toplevel=toplevel, by_name=by_name, path=_path, source=_source
+        )
+        for _path, _source in sources.items()
+    }
+    result = {}
+    for _path in paths:
+        reachable: set[Path] = set()
+        pending = list(imports[_path])
+        while pending:
+            _dependency = pending.pop()
+            if _dependency in reachable or _dependency == _path:
+                continue
+            reachable.add(_dependency)
+            pending.extend(imports[_dependency])
+        result[_path] = dependency_key(
+            toplevel=toplevel,
+            sources={_dependency: sources[_dependency] for _dependency in reachable},
+        )
+    return result
+
+
+def lint_dependency_hash(*, path: Path, source: bytes) -> str | None:
+    # lint_dependency_hashes() for one file, reading only the project files
+    # it reaches. Untracked modules count, a new file may be imported before
+    # it is added. None outside a git project.
+    path = path.resolve()
+    git = GitSession(cwd=path.parent)
+    try:
+        toplevel = git.toplevel.resolve()
+    except FileNotFoundError as e:
+        ic(e)
+        return None
+    paths = project_python_files(git, untracked=True)
+    if path not in paths:
+        paths.append(path)
+    by_name = project_module_index(toplevel=toplevel, paths=paths)
+    sources: dict[Path, bytes] = {}
+    pending = list(
+        project_imports(toplevel=toplevel, by_name=by_name, path=path, source=source)
+    )
+    while pending:
+        _dependency = pending.pop()
+        if _dependency in sources or _dependency == path:
             continue
-        if command == "#tty:":
-            tty = True
+        sources[_dependency] = _dependency.read_bytes()
+        pending.extend(
+            project_imports(
+                toplevel=toplevel,
+                by_name=by_name,
+                path=_dependency,
+                source=sources[_dependency],
+            )
+        )
+    return dependency_key(toplevel=toplevel, sources=sources)
+
+
+def lint_project(
+    *,
+    folder: Path,
+    jobs: int,
+    use_cache: bool = True,
+    out=sys.stdout,
+    summary=None,
+    only: Sequence[Path] = (),
+) -> int:
+    # pylint over every tracked .py file of the git project at folder, or
+    # the ones at or below the paths in only. Files whose content and
+    # imported project modules are unchanged since the last run come from
+    # the cache. Returns the bit-OR of the exit codes.
+    from concurrent.futures import ThreadPoolExecutor
+
+    git = GitSession(cwd=folder.resolve())
+    toplevel = git.toplevel.resolve()
+    # the whole project, the imports of a file may be anywhere in it
+    sources = {_path: _path.read_bytes() for _path in project_python_files(git)}
+    paths = list(sources)
+    if only:
+        selected = []
+        for _only in only:
+            _only = _only.resolve()
+            _matches = [
+                _path for _path in paths if _path == _only or _only in _path.parents
+            ]
+            if not _matches:
+                raise FileNotFoundError(f"no tracked .py files at {_only}")
+            selected.extend(_matches)
+        paths = list(dict.fromkeys(selected))
+    dependencies = lint_dependency_hashes(toplevel=toplevel, sources=sources)
+
+    cache = ResultCache(namespace="pylint", enabled=use_cache)
+    cached = 0
+    for _path in paths:
+        _key = pylint_cache_key(
+            path=_path,
+            source=sources[_path],
+            cwd=toplevel,
+            dependencies=dependencies[_path],
+        )
+        if cache.get(_key) is not None:
+            cached += 1
+    ic(len(paths), cached)
+
+    exit_codes = 0
+    output = PylintOutput(out=out)
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        results = executor.map(
+            lambda _path: lint_python_source(
+                path=_path,
+                source=sources[_path],
+                use_cache=use_cache,
+                cwd=toplevel,
+                dependencies=dependencies[_path],
+            ),
+            paths,
+        )
+        for _path, (_exit_code, _output) in zip(paths, results):
+            exit_codes |= _exit_code
+            if _exit_code:
+                for _line in _output.splitlines(keepends=True):
+                    output.write_line(_line)
+    print(
+        f"{len(paths)} files: {len(paths) - cached} linted, {cached} unchanged",
+        file=sys.stderr,
+    )
+    if summary is not None:
+        summary.write(
+            output.summary(
+                project=toplevel.as_posix(),
+                files=len(paths),
+                linted=len(paths) - cached,
+                exit_code=exit_codes,
+            )
+            + "\n"
+        )
+        summary.flush()
+    return exit_codes
+
+
+def run_checker(*, command: str, path: Path, out=sys.stdout) -> None:
+    # splint and shellcheck, findings are reported but do not stop the edit
+    import sh
+
+    with PROFILER.stage("lint"):
+        sh.Command(command)(
+            path,
+            _out=out,
+            _err=out,
+            _ok_code=[0, 1],
+        )
+
+
+BYTE_VECTOR_REPLACER_GUARD = b"# disable: byte_vector_replacer\n"
+
+
+def as_bytes(value: str | bytes) -> bytes:
+    if isinstance(value, bytes):
+        return value
+    return value.encode("utf8")
+
+
+def single_pass_safe(pairs: dict[bytes, bytes]) -> bool:
+    # True if replacing every match in one left to right pass gives the
+    # same result as one bytes.replace() per pair in order: no match may be
+    # empty, contain or overlap another match, or be formed (in part) by
+    # a replacement, and no replacement may be empty when there are others
+    for _match, _replacement in pairs.items():
+        if not _match or (not _replacement and len(pairs) > 1):
+            return False
+        for _other in pairs:
+            if _other == _match:
+                continue
+            if _other in _match:
+                return False
+            for _size in range(1, min(len(_match), len(_other))):
+                if _match[-_size:] == _other[:_size]:
+                    return False
+        for _other in pairs:
+            if _other == _match:  # a pair does not see its own output
+                continue
+            if _other in _replacement or _replacement in _other:
+                return False
+            for _size in range(1, min(len(_replacement), len(_other))):
+                if _replacement[-_size:] == _other[:_size]:
+                    return False
+                if _replacement[:_size] == _other[-_size:]:
+                    return False
+    return True
+
+
+# below this many pairs a bytes.replace() per pair is faster than the regex
+# (benchmark-byte-vector-replacer)
+SINGLE_PASS_MIN_PAIRS = 4
+
+
+class ByteVectorReplacer:
+    # the byte_vector_replacer pair set compiled into one alternation regex
+    # over bytes, longest first, applied in a single pass. Small pair sets,
+    # and sets where the order of the replacements matters (see
+    # single_pass_safe()), get one bytes.replace() per pair instead, as
+    # byte_vector_replacer does.
+
+    def __init__(self, pairs: dict[bytes, bytes], *, single_pass: bool):
+        import re
+
+        self.pairs = pairs
+        # identifies the replacements for the format cache
+        self.fingerprint = ResultCache.key(
+            *(_part for _pair in sorted(pairs.items()) for _part in _pair)
+        )
+        self.pattern = None
+        if single_pass and len(pairs) >= SINGLE_PASS_MIN_PAIRS:
+            self.pattern = re.compile(
+                b"|".join(
+                    re.escape(_match) for _match in sorted(pairs, key=len, reverse=True)
+                )
+            )
+
+    def replace(self, source: bytes) -> bytes:
+        if self.pattern is None:
+            result = source
+            for _match, _replacement in self.pairs.items():
+                result = result.replace(_match, _replacement)
+            return result
+        return self.pattern.sub(lambda match: self.pairs[match.group()], source)
+
+
+BYTE_VECTOR_CACHE_VERSION = 2
+
+
+class OpenRecorder:
+    # the files opened by the current thread inside record(), from the
+    # "open" audit event. The hook stays installed but idle afterwards.
+
+    def __init__(self):
+        self._local = threading.local()
+        self._hooked = False
+
+    def _audit(self, event: str, args) -> None:
+        opened = getattr(self._local, "opened", None)
+        if opened is None or event != "open":
+            return
+        _path, _mode = args[0], args[1]
+        if isinstance(_path, os.PathLike):
+            _path = os.fspath(_path)
+        if isinstance(_path, (str, bytes)) and (_mode is None or "r" in _mode):
+            _path = os.path.abspath(os.fsdecode(_path))
+            # bytecode follows the sources, which module_fingerprint() covers
+            if not _path.endswith(".pyc"):
+                opened.add(_path)
+
+    @contextlib.contextmanager
+    def record(self):
+        if not self._hooked:
+            sys.addaudithook(self._audit)
+            self._hooked = True
+        self._local.opened = opened = set()
+        try:
+            yield opened
+        finally:
+            self._local.opened = None
+
+
+OPEN_RECORDER = OpenRecorder()
+
+
+def file_stats(paths) -> list[tuple[str, int, int]]:
+    # (path, mtime_ns, size), or (path, 0, -1) for a missing file
+    result = []
+    for _path in sorted(paths):
+        try:
+            _stat = os.stat(_path)
+        except OSError:
+            result.append((_path, 0, -1))
             continue
+        result.append((_path, _stat.st_mtime_ns, _stat.st_size))
+    return result
 
-        if command == "# <br>":
-            result = ("\n", readme_md)
-        elif command.startswith("#"):
-            result = (f"\n$ {command}", readme_md)
-        else:
-            result = (f"\n$ {command}\n", readme_md)
-        ic(result)
-
-        _result = {"line": result[0], "readme": result[1]}
-        append_line_to_readme(**_result)
-
-        with open(readme_md, "a", encoding="utf8") as fh:
-            popen_instance = subprocess.Popen(
-                command,
-                stdout=fh,
-                stderr=fh,
-                shell=True,
+
+@functools.cache
+def byte_vector_replacer_engine() -> ByteVectorReplacer:
+    # the pairs are loaded once per process, and from the cache while the
+    # byte_vector_replacer sources and the files get_pairs() read (a pair
+    # file, if it uses one) are unchanged
+    import pickle
+
+    cache_file = cache_dir() / Path("byte_vector_replacer.pickle")
+    fingerprint = module_fingerprint("byte_vector_replacer")
+    try:
+        cached = pickle.loads(cache_file.read_bytes())
+        if (
+            cached["version"] == BYTE_VECTOR_CACHE_VERSION
+            and cached["byte_vector_replacer"] == fingerprint
+            and file_stats(_stat[0] for _stat in cached["pair_files"])
+            == cached["pair_files"]
+        ):
+            return ByteVectorReplacer(
+                cached["pairs"], single_pass=cached["single_pass"]
             )
-            output, errors = popen_instance.communicate()
-            exit_code = popen_instance.returncode
-            ic(output, errors, exit_code)
-
-    append_line_to_readme(line="\n```\n", readme=readme_md)
-    if _postprocess_readme_script.exists():
-        _postprocess_readme_command = sh.Command(_postprocess_readme_script)
-        _postprocessed_readme = _postprocess_readme_command(sh.cat(readme_md))
-        # ic(_postprocessed_readme)
-        with open(readme_md, "w", encoding="utf8") as fh:
-            fh.write(str(_postprocessed_readme))
-    if _validate_readme_script.exists():
-        _validate_readme_command = sh.Command(_validate_readme_script)
-        _postprocessed_readme = _validate_readme_command(sh.cat(readme_md))
-        # ic(_postprocessed_readme)
-        with open(readme_md, "w", encoding="utf8") as fh:
-            fh.write(str(_postprocessed_readme))
-    if unstaged_commits_exist(readme_md):
-        sh.git.status(_out=sys.stdout, _err=sys.stderr)
-        sh.git.add(readme_md)
-        # sh.git.commit("-m", "autoupdate README.md")
-        sh.git.status(_out=sys.stdout, _err=sys.stderr)
+    except (
+        FileNotFoundError,
+        pickle.UnpicklingError,
+        EOFError,
+        KeyError,
+        TypeError,
+    ) as e:
+        ic(e)
 
-    return
+    with OPEN_RECORDER.record() as opened:
+        from byte_vector_replacer import get_pairs
+
+        pairs = {
+            as_bytes(_match): as_bytes(_replacement)
+            for _match, _replacement in get_pairs().items()
+        }
+    ic(opened)
+    cached = {
+        "version": BYTE_VECTOR_CACHE_VERSION,
+        "byte_vector_replacer": fingerprint,
+        "pair_files": file_stats(opened),
+        "pairs": pairs,
+        "single_pass": single_pass_safe(pairs),
+    }
+    ic(len(pairs), cached["single_pass"])
+    try:
+        write_cache_file(path=cache_file, data=pickle.dumps(cached))
+    except OSError as e:
+        ic(e)
+    return ByteVectorReplacer(pairs, single_pass=cached["single_pass"])
 
 
-def run_pylint(
+def byte_vector_replace_source(
     *,
+    source: bytes,
     path: Path,
-    ignore_pylint: bool,
-):
-    # pylint: disable=too-many-function-args
-    git_py_files = " ".join(sh.git("ls-files", "*.py").strip().split("\n"))
-    # pylint: enable=too-many-function-args
-    pylint_command = sh.Command("pylint")
-    pylint_command.bake("--output-format=colorized", git_py_files)
-    try:
-        pylint_result = pylint_command(path, _ok_code=[0])
-        icp(pylint_result)
-        sh.grep(
-            "--color",
-            "-E",
-            ": E|$",
-            _out=sys.stdout,
-            _err=sys.stderr,
-            _in=pylint_result,
-        )
-        # _in=pylint_result.stdout,
-
-    except sh.ErrorReturnCode as e:
-        ic(e.exit_code)
-        sh.grep(
-            "--color", "-E", ": E|$", _out=sys.stdout, _err=sys.stderr, _in=e.stdout
-        )
-        exit_code = e.exit_code
-        if (exit_code & 0b00011) > 0:
-            ic("pylint returned an error or worse, exiting")
-            if not ignore_pylint:
-                sys.exit(exit_code)
+) -> bytes:
+    if BYTE_VECTOR_REPLACER_GUARD in source:
+        ic(
+            f"skipping byte_vector_replacer, found guard: {BYTE_VECTOR_REPLACER_GUARD!r}"
+        )
+        return source
+
+    result = byte_vector_replacer_engine().replace(source)
+    if result != source:
+        ic("byte_vector_replace_source() changed:", path)
+    return result
 
 
 def run_byte_vector_replacer(
@@ -394,16 +2004,102 @@ def run_byte_vector_replacer(
     ctx,
     path: Path,
 ) -> None:
-    pair_dict = get_pairs()
+    source = path.read_bytes()
+    result = byte_vector_replace_source(source=source, path=path)
+    if result != source:
+        atomic_write_bytes(path=path, data=result)
+
+
+# the in-process equivalents of the flags isort_path() passes
+ISORT_OPTIONS = {
+    "remove_redundant_aliases": True,
+    "include_trailing_comma": True,
+    "force_single_line": True,
+    "combine_star": True,
+}
+BLACK_GUARD = b"# disable: black\n"
+
+
+def module_available(name: str) -> bool:
+    import importlib.util
+
+    return importlib.util.find_spec(name) is not None
+
+
+@functools.cache
+def black_mode(pyproject_toml: str | None):
+    import black
+
+    if not pyproject_toml:
+        return black.Mode()
+    config = black.parse_pyproject_toml(pyproject_toml)
+    ic(pyproject_toml, config)
+    target_versions = {
+        black.TargetVersion[_version.upper()]
+        for _version in config.get("target_version", ())
+    }
+    return black.Mode(
+        target_versions=target_versions,
+        line_length=config.get("line_length", black.DEFAULT_LINE_LENGTH),
+        string_normalization=not config.get("skip_string_normalization", False),
+        magic_trailing_comma=not config.get("skip_magic_trailing_comma", False),
+        preview=config.get("preview", False),
+    )
+
+
+def black_source(
+    *,
+    source: bytes,
+    path: Path,
+) -> bytes:
+    import black
+
+    if BLACK_GUARD in source:
+        ic(f"skipping black, found guard: {BLACK_GUARD!r}")
+        return source
+
+    mode = black_mode(black.find_pyproject_toml((path.parent.as_posix(),)))
+    try:
+        return black.format_file_contents(
+            source.decode("utf8"),
+            fast=False,
+            mode=mode,
+        ).encode("utf8")
+    except black.NothingChanged:
+        return source
+
+
+@functools.cache
+def isort_config(settings_path: Path):
+    import isort
+
+    return isort.Config(settings_path=settings_path.as_posix(), **ISORT_OPTIONS)
+
+
+def isort_source(
+    *,
+    source: bytes,
+    path: Path,
+) -> bytes:
+    import isort
+    from isort.exceptions import FileSkipped
+
     try:
-        byte_vector_replacer(path=path, pair_dict=pair_dict)
-    except GuardFoundError as e:
+        return isort.code(
+            source.decode("utf8"),
+            config=isort_config(path.parent),
+            file_path=path,
+        ).encode("utf8")
+    except FileSkipped as e:
         ic(e)
+        return source
 
 
 def isort_path(
     path: Path,
 ) -> None:
+    import sh
+
     sh.isort(
         "--remove-redundant-aliases",
         "--trailing-comma",
@@ -420,7 +2116,9 @@ def isort_path(
 def black_path(
     path: Path,
 ) -> None:
-    guard = b"# disable: black\n"
+    import sh
+
+    guard = BLACK_GUARD
     ic(guard)
     if guard in path.read_bytes():
         ic(f"skipping black, found guard: {guard!r}")
@@ -432,6 +2130,428 @@ def black_path(
     )  # https://github.com/psf/black
 
 
+def repository_name(toplevel: Path) -> str | None:
+    # the portage name of the overlay checked out at toplevel
+    try:
+        return (
+            toplevel / Path("profiles") / Path("repo_name")
+        ).read_text().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def configured_repositories() -> set[str] | None:
+    # the repository names portage knows, None if portageq failed
+    try:
+        result = subprocess.run(
+            ["portageq", "get_repos", "/"],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError) as e:
+        ic(e)
+        return None
+    return set(result.stdout.decode("utf8").split())
+
+
+def overlay_repository(overlay: str) -> str | None:
+    # --gentoo-overlay-repo is a repository name or the checkout of one
+    if Path(overlay).is_dir():
+        return repository_name(Path(overlay).resolve())
+    return overlay
+
+
+class SyncScheduler:
+    # emaint sync for the repositories that changed, None (unknown) means
+    # all of them. With a window, a sync starts once no request came in for
+    # window seconds, so the requests in between become one sync. Background
+    # syncs run in a thread (sudo -n, output kept until flush()) while the
+    # next file is edited. flush() runs what is pending and waits for it.
+
+    def __init__(
+        self,
+        *,
+        overlay: str | None = None,
+        window: float = 0.0,
+        background: bool = False,
+    ):
+        self.overlay = overlay  # the repository with the ebuilds of the projects
+        self.window = window
+        self.background = background
+        self.pending: set[str | None] = set()
+        self.deadline: float | None = None
+        self.output: list[bytes] = []
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._timer: threading.Timer | None = None
+
+    def request(self, *repositories: str | None) -> None:
+        with self._lock:
+            self.pending.update(repositories)
+            self.deadline = time.monotonic() + self.window
+        if self.background:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.window, self._run_pending)
+            self._timer.daemon = True
+            self._timer.start()
+        elif not self.window:
+            self._run_pending()
+
+    def poll(self) -> None:
+        # foreground syncs whose window has passed, between files
+        if self.background or self.deadline is None:
+            return
+        if time.monotonic() >= self.deadline:
+            self._run_pending()
+
+    def flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer.join()
+            self._timer = None
+        self._run_pending()
+        output, self.output = self.output, []
+        for _output in output:
+            sys.stdout.buffer.write(_output)
+        sys.stdout.flush()
+
+    def _run_pending(self) -> None:
+        with self._lock:
+            repositories, self.pending = self.pending, set()
+            self.deadline = None
+        if not repositories:
+            return
+        with self._sync_lock:
+            self.sync(repositories)
+
+    def sync(self, repositories: set[str | None]) -> None:
+        # a name portage does not know would fail emaint sync -r after the
+        # push went through, so it is synced with the rest
+        if None not in repositories:
+            unknown = repositories - (configured_repositories() or set())
+            if unknown:
+                eprint(
+                    f"WARNING: not configured repositories: {' '.join(sorted(unknown))}, syncing all"
+                )
+                repositories = {None}
+        if None in repositories:
+            sync_args = [["-A"]]
+        else:
+            sync_args = [["-r", _name] for _name in sorted(repositories)]
+        for _args in sync_args:
+            icp("emaint sync", *_args)
+            with PROFILER.stage("sync"):
+                if not self.background:
+                    subprocess.run(["sudo", "emaint", "sync", *_args], check=True)
+                    continue
+                result = subprocess.run(
+                    ["sudo", "-n", "emaint", "sync", *_args],
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.STDOUT,
+                    check=False,
+                )
+                self.output.append(result.stdout)
+                if result.returncode:
+                    self.output.append(
+                        f"WARNING: background emaint sync {' '.join(_args)} exited {result.returncode}\n".encode(
+                            "utf8"
+                        )
+                    )
+
+
+def push_project(*, config: EditConfig, git: GitSession) -> bool:
+    # True if pushed, pushing is enabled by a .push file next to .edit_config
+    if not (config.remote and Path(config.path.parent / Path(".push")).is_file()):
+        ic(".push not found: push is not enabled, changes comitted locally")
+        return False
+    try:
+        with PROFILER.stage("git_push"):
+            git.run("push")
+    except subprocess.CalledProcessError as e:
+        if e.returncode != 128:
+            raise
+        icp(e)
+        icp(e.stdout)
+        icp(e.stderr)
+        icp("remote not found")
+        return False
+    return True
+
+
+def install_project(*, config: EditConfig, ignore_exit_code: bool) -> None:
+    import sh
+
+    # pylint: disable=no-name-in-module  # E0611 # No name 'ErrorReturnCode_1' in module 'sh'
+    from sh import CommandNotFound
+    from sh import ErrorReturnCode_1
+
+    # pylint: enable=no-name-in-module
+
+    with PROFILER.stage("install"):
+        if config.install_command:
+            os.system(config.install_command)
+        else:
+            sh.sudo.portagetool(
+                "install",
+                "--oneshot",
+                f"{config.group}/{config.short_package}",
+                _fg=True,
+            )
+    if not config.skip_test:
+        try:
+            help_command = sh.Command(config.short_package)
+        except CommandNotFound as e:
+            ic(e)
+        else:
+            with PROFILER.stage("test"):
+                try:
+                    help_command_result = help_command(
+                        config.test_command_arg,
+                        _out=sys.stdout,
+                        _err=sys.stderr,
+                        _in=sys.stdin,
+                    )
+                except ErrorReturnCode_1 as e:
+                    if ignore_exit_code:
+                        ic(e)
+                    else:
+                        ic(ignore_exit_code)
+                        raise e
+
+
+@dataclass(frozen=True, slots=True)
+class PrefetchedFile:
+    # a file read, pre-formatted (.py) and hashed ahead of its turn in
+    # edit. Only used if the stat data still matches when its turn comes.
+    path: Path
+    stat_key: tuple[int, int, int]
+    source: bytes
+    formatted: bytes | None
+    digest: bytes
+
+
+def prefetch_file(
+    path: Path,
+    *,
+    skip_black: bool,
+    skip_isort: bool,
+    skip_text_replace: bool,
+    use_cache: bool = True,
+) -> PrefetchedFile:
+    # the pre-edit work of edit_file() without writing anything
+    path = path.resolve()
+    _stat_key = stat_key(path)
+    source = path.read_bytes()
+    formatted = None
+    if path.as_posix().endswith(".py") and (
+        (skip_black or module_available("black"))
+        and (skip_isort or module_available("isort"))
+    ):
+        with contextlib.suppress(FileNotFoundError):
+            if parse_edit_config(path=path).dont_reformat:
+                skip_black = True
+                skip_isort = True
+        formatted = format_python_source(
+            source=source,
+            path=path,
+            skip_black=skip_black,
+            skip_isort=skip_isort,
+            skip_text_replace=skip_text_replace,
+            use_cache=use_cache,
+        )
+    return PrefetchedFile(
+        path=path,
+        stat_key=_stat_key,
+        source=source,
+        formatted=formatted,
+        digest=hashlib.sha3_256(source if formatted is None else formatted).digest(),
+    )
+
+
+class Prefetcher:
+    # yields (path, PrefetchedFile or None) from paths, with the next
+    # ahead paths already being prefetched in a thread pool while the
+    # current one is edited. A path that fails to prefetch (a syntax error
+    # for black, say) yields None and edit_file() does the work itself.
+
+    def __init__(
+        self, paths, *, ahead: int, prefetch: Callable[[Path], PrefetchedFile]
+    ):
+        self.paths = paths
+        self.ahead = ahead
+        self.prefetch = prefetch
+
+    def __iter__(self):
+        from collections import deque
+        from concurrent.futures import ThreadPoolExecutor
+
+        pending: deque = deque()
+        paths = iter(self.paths)
+        with ThreadPoolExecutor(max_workers=self.ahead) as executor:
+            for path in paths:
+                pending.append(
+                    (path, executor.submit(self.prefetch, Path(os.fsdecode(path))))
+                )
+                # the current path plus ahead more
+                while len(pending) > self.ahead:
+                    yield self._result(*pending.popleft())
+            while pending:
+                yield self._result(*pending.popleft())
+
+    @staticmethod
+    def _result(path, future) -> tuple:
+        try:
+            return path, future.result()
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            ic("prefetch failed:", path, e)
+            return path, None
+
+
+class PostEditQueue:
+    # edit --batch --prefetch: the post-edit stages of a file run in one
+    # background worker while the next file is in the editor. Their output
+    # is held and printed by drain() between editor sessions, where a
+    # failure (the SystemExit of a lint error) is re-raised.
+
+    def __init__(self):
+        from concurrent.futures import ThreadPoolExecutor
+
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.submitted: list = []
+
+    def submit(self, function: Callable) -> None:
+        import io
+
+        buffer = io.StringIO()
+        # the stages are profiled under the file they were submitted for
+        binding = PROFILER.binding()
+
+        def run():
+            with PROFILER.bound(binding):
+                return function(buffer)
+
+        self.submitted.append((self.executor.submit(run), buffer))
+
+    def drain(self, *, wait: bool = False) -> None:
+        while self.submitted:
+            future, buffer = self.submitted[0]
+            if not (wait or future.done()):
+                return
+            exception = future.exception()
+            self.submitted.pop(0)
+            sys.stdout.write(buffer.getvalue())
+            sys.stdout.flush()
+            if exception is not None:
+                raise exception
+
+    def close(self, *, cancel: bool = False) -> None:
+        # waits for the submitted work and prints its output. With cancel
+        # (the batch is ending on an error) work that has not started is
+        # dropped and failures are only reported.
+        if cancel:
+            for _future, _buffer in self.submitted:
+                _future.cancel()
+        self.executor.shutdown(wait=True)
+        if not cancel:
+            self.drain(wait=True)
+            return
+        for _future, _buffer in self.submitted:
+            if _future.cancelled():
+                continue
+            sys.stdout.write(_buffer.getvalue())
+            if _future.exception() is not None:
+                eprint("ERROR:", repr(_future.exception()))
+        sys.stdout.flush()
+        self.submitted = []
+
+
+class EditBatch:
+    # edit --batch: files are formatted, linted and staged one at a time,
+    # the README, commit and push happen once per project (the .edit_config
+    # directory) or ebuild repository in finish(), followed by one sync of
+    # the repositories that changed and then the installs
+
+    def __init__(
+        self,
+        *,
+        ignore_exit_code: bool,
+        readme_jobs: int | None = None,
+        use_cache: bool = True,
+        refresh_examples: bool = False,
+        sync: SyncScheduler | None = None,
+    ):
+        self.ignore_exit_code = ignore_exit_code
+        self.sync = SyncScheduler() if sync is None else sync
+        self.readme_jobs = readme_jobs
+        self.use_cache = use_cache
+        self.refresh_examples = refresh_examples
+        # .edit_config -> (config, a file in the project)
+        self.projects: dict[Path, tuple[EditConfig, Path]] = {}
+        self.ebuild_repositories: dict[Path, GitSession] = {}
+        # projects whose `git add -u` was left to finish()
+        self.deferred_updates: set[Path] = set()
+
+    def add_project(self, *, config: EditConfig, path: Path) -> None:
+        self.projects[config.path] = (config, path)
+
+    def add_ebuild(self, *, git: GitSession) -> None:
+        self.ebuild_repositories.setdefault(git.toplevel, git)
+
+    def defer_update(self, *, config: EditConfig) -> None:
+        self.deferred_updates.add(config.path)
+
+    def finish(self, *, complete: bool = True) -> None:
+        # complete is False when a lint failure ended the batch, the deferred
+        # `git add -u` would stage the failing file, so it is skipped
+        from with_chdir import chdir
+
+        repositories: set[str | None] = set()
+        for _toplevel, _git in self.ebuild_repositories.items():
+            icp("ebuild repository:", _toplevel)
+            with PROFILER.stage("git"):
+                _git.add("-u")
+                if _git.staged_changes():
+                    _git.commit("--verbose", "-m", "auto-commit", show=True)
+                _git.run("push", show=True)
+            repositories.add(repository_name(_toplevel))
+
+        committed = []
+        for _config, _path in self.projects.values():
+            icp("project:", _config.path.parent)
+            git = GitSession(cwd=_config.path.parent)
+            with chdir(_config.path.parent):
+                if complete and _config.path in self.deferred_updates:
+                    with PROFILER.stage("git"):
+                        git.add("-u")
+                autogenerate_readme(
+                    path=_path,
+                    config=_config,
+                    jobs=self.readme_jobs,
+                    use_cache=self.use_cache,
+                    refresh_examples=self.refresh_examples,
+                    git=git,
+                )
+                if not git.staged_changes():
+                    continue
+                with PROFILER.stage("git"):
+                    git.commit("--verbose", "-m", "auto-commit")
+                committed.append(_config)
+                if push_project(config=_config, git=git):
+                    repositories.add(self.sync.overlay)
+            ic("git processes spawned:", git.process_count)
+
+        if repositories:
+            self.sync.request(*repositories)
+        self.sync.flush()
+        for _config in committed:
+            with chdir(_config.path.parent):
+                install_project(config=_config, ignore_exit_code=self.ignore_exit_code)
+
+
 def edit_file(
     *,
     ctx,
@@ -444,7 +2564,21 @@ def edit_file(
     skip_text_replace: bool,
     non_interactive: bool,
     ignore_exit_code: bool,
+    use_cache: bool = True,
+    readme_jobs: int | None = None,
+    refresh_examples: bool = False,
+    watch: bool = False,
+    batch: EditBatch | None = None,
+    sync: SyncScheduler | None = None,
+    prefetched: PrefetchedFile | None = None,
+    post_edit_queue: PostEditQueue | None = None,
+    lint_summary=None,
 ) -> None:
+    import sh
+    from with_chdir import chdir
+
+    if sync is None:
+        sync = SyncScheduler()
     path = path.resolve()
     if not path.is_file():
         eprint("ERROR:", path.as_posix(), "is not a regular file.")
@@ -472,168 +2606,40 @@ def edit_file(
     ic(editor, path)
 
     project_folder = None
-    group = None
-    remote = None
-    dont_reformat = None
+    config = None
     try:
-        (
-            edit_config,
-            short_package,
-            group,
-            remote,
-            test_command_arg,
-            dont_reformat,
-            install_command,
-            skip_test,
-        ) = parse_edit_config(
+        config = parse_edit_config(
             path=path,
         )
-        project_folder = edit_config.parent
+        project_folder = config.path.parent
     except FileNotFoundError:
         if not path.as_posix().endswith(".ebuild"):
             icp("NO .edit_config found, and its not an ebuild, exiting...")
             return
 
-    if dont_reformat:
+    if config is not None and config.dont_reformat:
         skip_isort = True
         skip_black = True
 
-    if path.as_posix().endswith(".py"):
-        autoformat_python(
-            path=path,
-            skip_black=skip_black,
-            skip_isort=skip_isort,
-        )
-
-    if path.as_posix().endswith(".py"):
-        if not skip_text_replace:
-            run_byte_vector_replacer(
-                ctx=ctx,
-                path=path,
-            )
-    if path.as_posix().endswith(".zig"):
-        splint_command = sh.Command("zig")
-        splint_result = splint_command(
-            "fmt",
-            path,
-            _out=sys.stdout,
-            _err=sys.stderr,
-            _in=sys.stdin,
-            _tee=True,
-        )
-
-    pre_edit_hash = sha3_256_hash_file(path=path)
-    if not non_interactive:
-        os.system(editor + " " + path.as_posix())
-    post_edit_hash = sha3_256_hash_file(
-        path=path,
-    )
-    if pre_edit_hash != post_edit_hash:
-        ic(
-            "file changed:",
-            path,
-            pre_edit_hash,
-            post_edit_hash,
-        )
-    if unstaged_commits_exist(
-        path,
-    ):
-        ic("unstaged_commits_exist() returned True")
-    else:
-        ic("unstaged_commits_exist() returned False")
-    if (
-        (pre_edit_hash != post_edit_hash)
-        or disable_change_detection
-        or unstaged_commits_exist(path)
-    ):
-        if project_folder:
-            os.chdir(project_folder)
-            # with chdir(project_folder):
-
-        ic(path.as_posix())
-        sh.chown("user:user", path)  # fails if cant
-
-        if path.as_posix().endswith(".py"):
-            autoformat_python(
-                path=path,
-                skip_black=skip_black,
-                skip_isort=skip_isort,
-            )
-
-            if not skip_pylint:
-                run_pylint(
-                    path=path,
-                    ignore_pylint=ignore_pylint,
-                )
-                # Pylint should leave with following status code:
-                #   * 0 if everything went fine
-                # F * 1 if a fatal message was issued
-                # E * 2 if an error message was issued
-                # W * 4 if a warning message was issued
-                # R * 8 if a refactor message was issued
-                # C * 16 if a convention message was issued
-                #   * 32 on usage error
-                # status 1 to 16 will be bit-ORed
-
-        elif path.as_posix().endswith(".ebuild"):
-            with chdir(
-                path.resolve().parent,
-            ):
-                sh.ebuild(path, "manifest")
-                # sh.git.add(path.parent / Path('Manifest'))
-                sh.git.add(Path("Manifest"))
-                sh.git.add(path.name)
-                _files = Path(path / Path("files"))
-                if _files.exists():
-                    sh.git.add("files/*")
-                # cd "${file_dirname}" # should already be here...
-                # dev-util/pkgcheck and dev-util/pkgdev
-                # try:
-                #    sh.repoman(
-                #        "fix",
-                #        _out=sys.stdout,
-                #        _err=sys.stderr,
-                #        _in=sys.stdin,
-                #        _ok_code=[0, 1],
-                #    )
-                # except sh.ErrorReturnCode_1 as e:
-                #    ic(e)
-                #    print(e.stdout)
-                # try:
-                #    sh.repoman(
-                #        _out=sys.stdout, _err=sys.stderr, _in=sys.stdin, _ok_code=[0, 1]
-                #    )
-                # except sh.ErrorReturnCode_1 as e:
-                #    ic(e)
-                #    print(e.stdout)
-
-                sh.git.add("-u", _out=sys.stdout, _err=sys.stderr, _in=sys.stdin)
-                sh.git.commit(
-                    "--verbose",
-                    "-m",
-                    "auto-commit",
-                    _out=sys.stdout,
-                    _err=sys.stderr,
-                    _in=sys.stdin,
-                )
-                sh.git.push(_out=sys.stdout, _err=sys.stderr, _in=sys.stdin)
-                # sh.git.push(_out=sys.stdout, _err=sys.stderr, _in=sys.stdin, _tty_in=True)
-                # sh.git.push(_out=sys.stdout, _err=sys.stderr, _tty_in=True)
-                sh.sudo.emaint("sync", "-A", _fg=True)
-                sys.exit(0)
-
-        elif path.as_posix().endswith(".c"):
-            splint_command = sh.Command("splint")
-            splint_result = splint_command(
-                path,
-                _out=sys.stdout,
-                _err=sys.stderr,
-                _in=sys.stdin,
-                _tee=True,
-                _ok_code=[0, 1],
+    # .py files are read once, transformed in memory and written once,
+    # the hashes below are taken from the buffers
+    pre_edit_data = None
+    if prefetched is not None and prefetched.stat_key != stat_key(path):
+        ic("changed since it was prefetched:", path)
+        prefetched = None
+    with PROFILER.stage("pre_edit_format"):
+        if path.as_posix().endswith(".py"):
+            pre_edit_data = autoformat_python(
+                path=path,
+                skip_black=skip_black,
+                skip_isort=skip_isort,
+                skip_text_replace=skip_text_replace,
+                use_cache=use_cache,
+                source=None if prefetched is None else prefetched.source,
+                formatted=None if prefetched is None else prefetched.formatted,
             )
 
-        elif path.as_posix().endswith(".zig"):
+        if path.as_posix().endswith(".zig"):
             splint_command = sh.Command("zig")
             splint_result = splint_command(
                 "fmt",
@@ -644,87 +2650,211 @@ def edit_file(
                 _tee=True,
             )
 
-        elif path.as_posix().endswith(".sh"):
-            shellcheck_command = sh.Command("shellcheck")
-            shellcheck_result = shellcheck_command(
-                path,
-                _out=sys.stdout,
-                _err=sys.stderr,
-                _in=sys.stdin,
-                _tee=True,
-                _ok_code=[0, 1],
-            )  # TODO
-
-        ic(os.getcwd())
-        autogenerate_readme(
-            path=path,
-        )
-        command = sh.git.diff
-        ic(command)
-        command(_out=sys.stdout, _err=sys.stderr)
-
-        sh.git.add(path)  # covered below too
-        sh.git.add("-u")  # all tracked files
-
-        unstaged_changes_exist_command = sh.Command("git")
-        unstaged_changes_exist_command_result = unstaged_changes_exist_command(
-            "diff-index", "HEAD", "--"
+    # the prefetched digest is of the content before pre-edit processing,
+    # it holds if that left the file as formatted ahead (.py), or did not
+    # touch it (the stat data of zig fmt's rewrite differs)
+    digest = None
+    if prefetched is not None and (
+        pre_edit_data == prefetched.formatted
+        if pre_edit_data is not None
+        else stat_key(path) == prefetched.stat_key
+    ):
+        digest = prefetched.digest
+    change_detector = ChangeDetector(path=path, data=pre_edit_data, digest=digest)
+    del pre_edit_data
+    watcher = None
+    if watch and use_cache and not non_interactive:
+        # format and lint every save in the background, the post-edit
+        # stages below then find their results in the cache
+        watcher = PipelineWatcher(
+            folder=path.parent,
+            process=functools.partial(
+                precompute_python,
+                skip_black=skip_black,
+                skip_isort=skip_isort,
+                skip_pylint=skip_pylint,
+                cwd=project_folder or Path(os.getcwd()),
+            ),
         )
-        print(unstaged_changes_exist_command_result)
-        if path.as_posix() in unstaged_changes_exist_command_result:
-            sh.git.add(path)
-
-        sh.git.diff("--cached")
-        try:
-            staged_but_uncomitted_changes_exist_command = sh.git.diff(
-                "--cached", "--exit-code"
-            )
-            ic(staged_but_uncomitted_changes_exist_command)
-        except ErrorReturnCode_1:
-            icp("comitting")
-            sh.git.add("-u")  # all tracked files
-            sh.git.commit("--verbose", "-m", "auto-commit")
-            if remote and Path(edit_config.parent / Path(".push")).is_file():
-                try:
-                    sh.git.push()
-                    sh.sudo.emaint("sync", "-A", _fg=True)
-                except sh.ErrorReturnCode_128 as e:
-                    icp(e)
-                    icp(e.stdout)
-                    icp(e.stderr)
-                    icp("remote not found")
-
-            else:
-                ic(".push not found: push is not enabled, changes comitted locally")
+        watcher.start()
+    with PROFILER.stage("editor"):
+        if not non_interactive:
+            os.system(editor + " " + path.as_posix())
+    if watcher is not None:
+        watcher.stop()
+        ic("watch mode processed:", watcher.processed)
+    if change_detector.changed():
+        ic("file changed:", path)
+
+    # everything after the editor, in the background with post_edit_queue
+    def post_edit(out) -> None:
+        git = GitSession(cwd=path.parent)
+        if (
+            change_detector.changed()
+            or disable_change_detection
+            or change_detector.unstaged_changes(git)
+        ):
+            if project_folder:
+                os.chdir(project_folder)
+                # with chdir(project_folder):
+
+            ic(path.as_posix())
+            sh.chown("user:user", path)  # fails if cant
+
+            # lint and README generation are independent and run concurrently,
+            # the diff and add wait for both, and a lint failure skips them
+            scheduler = StageScheduler(out=out)
+            if path.as_posix().endswith(".py"):
+                with PROFILER.stage("post_edit_format"):
+                    autoformat_python(
+                        path=path,
+                        skip_black=skip_black,
+                        skip_isort=skip_isort,
+                        source=change_detector.after_data,
+                        use_cache=use_cache,
+                    )
+
+                if not skip_pylint:
+                    scheduler.add(
+                        "lint",
+                        lambda out: run_pylint(
+                            path=path,
+                            ignore_pylint=ignore_pylint,
+                            use_cache=use_cache,
+                            out=out,
+                            summary=lint_summary,
+                        ),
+                        live=True,
+                    )
+                    # Pylint should leave with following status code:
+                    #   * 0 if everything went fine
+                    # F * 1 if a fatal message was issued
+                    # E * 2 if an error message was issued
+                    # W * 4 if a warning message was issued
+                    # R * 8 if a refactor message was issued
+                    # C * 16 if a convention message was issued
+                    #   * 32 on usage error
+                    # status 1 to 16 will be bit-ORed
+
+            elif path.as_posix().endswith(".ebuild"):
+                with chdir(
+                    path.resolve().parent,
+                ):
+                    with PROFILER.stage("ebuild_manifest"):
+                        sh.ebuild(path, "manifest")
+                    # sh.git.add(path.parent / Path('Manifest'))
+                    _ebuild_paths = ["Manifest", path.name]
+                    _files = Path(path.parent / Path("files"))
+                    if _files.exists():
+                        _ebuild_paths.append("files")
+                    git.add("--", *_ebuild_paths)
+                    if batch is not None:
+                        batch.add_ebuild(git=git)
+                        return
+                    # cd "${file_dirname}" # should already be here...
+                    # dev-util/pkgcheck and dev-util/pkgdev
+                    # try:
+                    #    sh.repoman(
+                    #        "fix",
+                    #        _out=sys.stdout,
+                    #        _err=sys.stderr,
+                    #        _in=sys.stdin,
+                    #        _ok_code=[0, 1],
+                    #    )
+                    # except sh.ErrorReturnCode_1 as e:
+                    #    ic(e)
+                    #    print(e.stdout)
+                    # try:
+                    #    sh.repoman(
+                    #        _out=sys.stdout, _err=sys.stderr, _in=sys.stdin, _ok_code=[0, 1]
+                    #    )
+                    # except sh.ErrorReturnCode_1 as e:
+                    #    ic(e)
+                    #    print(e.stdout)
+
+                    with PROFILER.stage("git"):
+                        git.add("-u")
+                        git.commit("--verbose", "-m", "auto-commit", show=True)
+                        git.run("push", show=True)
+                    # sh.git.push(_out=sys.stdout, _err=sys.stderr, _in=sys.stdin, _tty_in=True)
+                    # sh.git.push(_out=sys.stdout, _err=sys.stderr, _tty_in=True)
+                    sync.request(repository_name(git.toplevel))
+                    ic("git processes spawned:", git.process_count)
+                    sys.exit(0)
+
+            elif path.as_posix().endswith(".c"):
+                scheduler.add(
+                    "lint",
+                    lambda out: run_checker(command="splint", path=path, out=out),
+                )
 
-            if install_command:
-                os.system(install_command)
+            elif path.as_posix().endswith(".zig"):
+                with PROFILER.stage("post_edit_format"):
+                    splint_command = sh.Command("zig")
+                    splint_result = splint_command(
+                        "fmt",
+                        path,
+                        _out=sys.stdout,
+                        _err=sys.stderr,
+                        _in=sys.stdin,
+                        _tee=True,
+                    )
+
+            elif path.as_posix().endswith(".sh"):
+                scheduler.add(
+                    "lint",
+                    lambda out: run_checker(command="shellcheck", path=path, out=out),
+                )  # TODO
+
+            ic(os.getcwd())
+            if batch is not None:
+                # README, commit, push, sync and install once per project
+                batch.add_project(config=config, path=path)
             else:
-                sh.sudo.portagetool(
-                    "install",
-                    "--oneshot",
-                    f"{group}/{short_package}",
-                    _fg=True,
+                scheduler.add(
+                    "readme",
+                    lambda out: autogenerate_readme(
+                        path=path,
+                        config=config,
+                        jobs=readme_jobs,
+                        use_cache=use_cache,
+                        refresh_examples=refresh_examples,
+                        git=git,
+                    ),
                 )
-            if not skip_test:
-                try:
-                    help_command = sh.Command(short_package)
-                except CommandNotFound as e:
-                    ic(e)
-                else:
-                    try:
-                        help_command_result = help_command(
-                            test_command_arg,
-                            _out=sys.stdout,
-                            _err=sys.stderr,
-                            _in=sys.stdin,
-                        )
-                    except ErrorReturnCode_1 as e:
-                        if ignore_exit_code:
-                            ic(e)
-                        else:
-                            ic(ignore_exit_code)
-                            raise e
+
+            def diff_and_add(_out) -> None:
+                with PROFILER.stage("git"):
+                    if out is sys.stdout:
+                        git.run("diff", show=True)
+                    else:
+                        _out.write(git.run("diff").decode("utf8", errors="replace"))
+
+                    if post_edit_queue is None:
+                        git.add_updated(path)  # path, and all tracked files
+                    else:
+                        # the next file may be open in the editor, not yet
+                        # linted, so `git add -u` waits for finish()
+                        git.add("--", path.as_posix())
+                        batch.defer_update(config=config)
+
+            scheduler.add("diff", diff_and_add, after=("lint", "readme"))
+            scheduler.run()
+
+            if batch is None and git.staged_changes():
+                icp("comitting")
+                with PROFILER.stage("git"):
+                    git.commit("--verbose", "-m", "auto-commit")
+                if push_project(config=config, git=git):
+                    sync.request(sync.overlay)
+                install_project(config=config, ignore_exit_code=ignore_exit_code)
+
+        ic("git processes spawned:", git.process_count)
+
+    if post_edit_queue is not None:
+        post_edit_queue.submit(post_edit)
+    else:
+        post_edit(sys.stdout)
 
 
 @click.group(
@@ -748,18 +2878,104 @@ def cli(
         ic=ic,
         gvd=gvd,
     )
+    ctx.default_map = read_config()
+
+
+def transform_python_source(
+    *,
+    source: bytes,
+    path: Path,
+    skip_black: bool,
+    skip_isort: bool,
+    skip_text_replace: bool,
+) -> bytes:
+    # black -> isort -> byte vector replacement, buffer to buffer
+    result = source
+    if not skip_black:
+        result = black_source(source=result, path=path)
+    if not skip_isort:
+        result = isort_source(source=result, path=path)
+    if not skip_text_replace:
+        result = byte_vector_replace_source(source=result, path=path)
+    return result
+
+
+def format_python_source(
+    *,
+    source: bytes,
+    path: Path,
+    skip_black: bool,
+    skip_isort: bool,
+    skip_text_replace: bool,
+    use_cache: bool = True,
+) -> bytes:
+    # transform_python_source() through the format cache, nothing is written
+    cache = ResultCache(namespace="format", enabled=use_cache)
+    cache_key = cache.key(
+        path.as_posix(),
+        source,
+        f"{skip_black}:{skip_isort}:{skip_text_replace}",
+        module_fingerprint("black"),
+        module_fingerprint("isort"),
+        "" if skip_text_replace else byte_vector_replacer_engine().fingerprint,
+        config_fingerprint(path=path, names=FORMAT_CONFIG_FILES),
+    )
+    result = cache.get(cache_key)
+    if result is None:
+        result = transform_python_source(
+            source=source,
+            path=path,
+            skip_black=skip_black,
+            skip_isort=skip_isort,
+            skip_text_replace=skip_text_replace,
+        )
+        cache.put(cache_key, result)
+    else:
+        ic("format_python_source() result from cache:", path)
+    return result
 
 
 def autoformat_python(
     path: Path,
     skip_black: bool,
     skip_isort: bool,
+    skip_text_replace: bool = True,
+    source: bytes | None = None,
+    use_cache: bool = True,
     verbose: bool = False,
-):
+    formatted: bytes | None = None,
+) -> bytes:
+    # when the black and isort libraries are importable the stages run
+    # in-process on a single read of the file, and the result is committed
+    # with one atomic rename only if it differs. Returns the file content.
+    # formatted is the result for source when it was computed ahead.
+    if (skip_black or module_available("black")) and (
+        skip_isort or module_available("isort")
+    ):
+        if source is None:
+            source = path.read_bytes()
+        result = formatted
+        if result is None:
+            result = format_python_source(
+                source=source,
+                path=path,
+                skip_black=skip_black,
+                skip_isort=skip_isort,
+                skip_text_replace=skip_text_replace,
+                use_cache=use_cache,
+            )
+        if result != source:
+            ic("autoformat_python() changed:", path)
+            atomic_write_bytes(path=path, data=result)
+        return result
+
     if not skip_black:
         black_path(path=path)
     if not skip_isort:
         isort_path(path=path)
+    if not skip_text_replace:
+        run_byte_vector_replacer(ctx=None, path=path)
+    return path.read_bytes()
 
 
 @cli.command()
@@ -785,6 +3001,125 @@ def isort(
         isort_path(path=path)
 
 
+def format_path(
+    path: Path,
+    *,
+    skip_black: bool,
+    skip_isort: bool,
+    skip_text_replace: bool,
+    use_cache: bool = True,
+) -> str:
+    # the format subcommand's work for one file, in a worker process.
+    # Returns "changed", "unchanged", "skipped" or the error.
+    if not path.as_posix().endswith(".py"):
+        return "skipped"
+    # the target of a symlink is formatted, with its own config files
+    path = path.resolve()
+    try:
+        with contextlib.suppress(FileNotFoundError):
+            if parse_edit_config(path=path).dont_reformat:
+                skip_black = True
+                skip_isort = True
+        source = path.read_bytes()
+        result = autoformat_python(
+            path=path,
+            skip_black=skip_black,
+            skip_isort=skip_isort,
+            skip_text_replace=skip_text_replace,
+            source=source,
+            use_cache=use_cache,
+        )
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        _message = str(e).strip().splitlines()
+        return f"error: {type(e).__name__}: {_message[0] if _message else ''}"
+    return "changed" if result != source else "unchanged"
+
+
+@cli.command("format")
+@click.argument("paths", type=click.Path(path_type=Path), nargs=-1)
+@click.option("--jobs", type=click.IntRange(min=1))
+@click.option("--skip-black", is_flag=True)
+@click.option("--skip-isort", is_flag=True)
+@click.option("--skip-text-replace", is_flag=True)
+@click.option("--no-cache", is_flag=True)
+@click_add_options(click_global_options)
+@click.pass_context
+def format_paths(
+    ctx,
+    paths: tuple[Path, ...],
+    jobs: int | None,
+    skip_black: bool,
+    skip_isort: bool,
+    skip_text_replace: bool,
+    no_cache: bool,
+    verbose_inf: bool,
+    dict_output: bool,
+    verbose: bool = False,
+):
+    # black + isort + byte_vector_replacer over many files in a process pool,
+    # the paths are arguments or an unmp stream on stdin
+    from collections import Counter
+    from concurrent.futures import ProcessPoolExecutor
+
+    if not verbose:
+        ic.disable()
+
+    not_root()
+    tty, verbose = tvicgvd(
+        ctx=ctx,
+        verbose=verbose,
+        verbose_inf=verbose_inf,
+        ic=ic,
+        gvd=gvd,
+    )
+
+    if paths:
+        iterator = paths
+    else:
+        from unmp import unmp
+
+        iterator = unmp(
+            valid_types=[
+                bytes,
+            ],
+        )
+    # a symlink and its target, or a repeated path, is one file, formatted
+    # once under the first .py name it was given as (format_path() skips
+    # the others)
+    targets: dict[Path, Path] = {}
+    for path in iterator:
+        _path = Path(os.fsdecode(path))
+        _target = _path.resolve()
+        _known = targets.get(_target)
+        if _known is None or not _known.as_posix().endswith(".py"):
+            targets[_target] = _path
+    _paths = list(targets.values())
+
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    worker = functools.partial(
+        format_path,
+        skip_black=skip_black,
+        skip_isort=skip_isort,
+        skip_text_replace=skip_text_replace,
+        use_cache=not no_cache,
+    )
+    counts: Counter = Counter()
+    with ProcessPoolExecutor(max_workers=min(jobs, max(1, len(_paths)))) as executor:
+        chunksize = max(1, min(64, len(_paths) // (jobs * 4)))
+        for path, status in zip(
+            _paths, executor.map(worker, _paths, chunksize=chunksize)
+        ):
+            counts[status.split(":")[0]] += 1
+            print(f"{status}: {path.as_posix()}")
+    print(
+        f"{len(_paths)} files: {counts['changed']} changed, {counts['unchanged']} unchanged, {counts['skipped']} skipped, {counts['error']} failed",
+        file=sys.stderr,
+    )
+    if counts["error"]:
+        sys.exit(1)
+
+
 @cli.command()
 @click.argument("paths", type=click.Path(path_type=Path), nargs=-1)
 @click.option("--apps-folder", type=str, required=True)
@@ -792,7 +3127,7 @@ def isort(
 @click.option("--github-user", type=str, required=True)
 @click.option(
     "--license",
-    type=click.Choice(build_license_list()),
+    type=LazyChoice(cached_license_list),
     default="ISC",
 )
 @click.option("--disable-change-detection", is_flag=True)
@@ -804,6 +3139,17 @@ def isort(
 @click.option("--skip-text-replace", is_flag=True)
 @click.option("--ignore-exit-code", is_flag=True)
 @click.option("--ignore-checks", "skip_code_checks", is_flag=True)
+@click.option("--no-cache", is_flag=True)
+@click.option("--readme-jobs", type=click.IntRange(min=1))
+@click.option("--refresh-examples", is_flag=True)
+@click.option("--watch", is_flag=True)
+@click.option("--batch", is_flag=True)
+@click.option("--sync-window", type=click.FloatRange(min=0), default=0.0)
+@click.option("--background-sync", is_flag=True)
+@click.option("--prefetch", type=click.IntRange(min=0), default=0)
+@click.option("--lint-summary", type=click.File("a"))
+@click.option("--profile", is_flag=True)
+@click.option("--profile-log", type=click.Path(dir_okay=False, path_type=Path))
 @click_add_options(click_global_options)
 @click.pass_context
 def edit(
@@ -823,6 +3169,17 @@ def edit(
     ignore_exit_code: bool,
     skip_pylint: bool,
     skip_code_checks: bool,
+    no_cache: bool,
+    readme_jobs: int | None,
+    refresh_examples: bool,
+    watch: bool,
+    batch: bool,
+    sync_window: float,
+    background_sync: bool,
+    prefetch: int,
+    lint_summary,
+    profile: bool,
+    profile_log: Path | None,
     dict_output: bool,
     verbose: bool = False,
 ):
@@ -845,6 +3202,8 @@ def edit(
     if paths:
         iterator = paths
     else:
+        from unmp import unmp
+
         iterator = unmp(
             valid_types=[
                 bytes,
@@ -855,31 +3214,115 @@ def edit(
     for _ in range(height):
         print("")
 
-    for index, path in enumerate(iterator):
-        icp(index, path)
-        _path = Path(os.fsdecode(path))
-
-        edit_file(
-            ctx=ctx,
-            path=_path,
-            disable_change_detection=disable_change_detection,
-            ignore_pylint=ignore_pylint,
-            skip_pylint=skip_pylint,
-            skip_isort=skip_isort,
-            skip_black=skip_black,
-            skip_text_replace=skip_text_replace,
-            non_interactive=non_interactive,
+    # only the overlay that changed is synced, after --sync-window seconds
+    # without another push, once per batch with --batch
+    sync = SyncScheduler(
+        overlay=overlay_repository(gentoo_overlay_repo),
+        window=sync_window,
+        background=background_sync,
+    )
+    edit_batch = None
+    if batch:
+        edit_batch = EditBatch(
             ignore_exit_code=ignore_exit_code,
+            readme_jobs=readme_jobs,
+            use_cache=not no_cache,
+            refresh_examples=refresh_examples,
+            sync=sync,
+        )
+
+    # --prefetch K reads and formats the next K files while one is edited,
+    # with --batch the post-edit stages also move to the background
+    post_edit_queue = None
+    if prefetch:
+        import importlib
+
+        # imported here, the first import racing in several threads can
+        # hand one of them a partially initialized module
+        for _name in ("black", "isort"):
+            if module_available(_name):
+                importlib.import_module(_name)
+        iterator = Prefetcher(
+            iterator,
+            ahead=prefetch,
+            prefetch=functools.partial(
+                prefetch_file,
+                skip_black=skip_black,
+                skip_isort=skip_isort,
+                skip_text_replace=skip_text_replace,
+                use_cache=not no_cache,
+            ),
         )
+        if batch:
+            post_edit_queue = PostEditQueue()
+    else:
+        iterator = ((path, None) for path in iterator)
+
+    with profiling(command="edit", profile=profile, profile_log=profile_log):
+        try:
+            for index, (path, prefetched) in enumerate(iterator):
+                if post_edit_queue is not None:
+                    post_edit_queue.drain()
+                icp(index, path)
+                _path = Path(os.fsdecode(path))
+                PROFILER.context = {"path": _path.as_posix()}
+
+                edit_file(
+                    ctx=ctx,
+                    path=_path,
+                    disable_change_detection=disable_change_detection,
+                    ignore_pylint=ignore_pylint,
+                    skip_pylint=skip_pylint,
+                    skip_isort=skip_isort,
+                    skip_black=skip_black,
+                    skip_text_replace=skip_text_replace,
+                    non_interactive=non_interactive,
+                    ignore_exit_code=ignore_exit_code,
+                    use_cache=not no_cache,
+                    readme_jobs=readme_jobs,
+                    refresh_examples=refresh_examples,
+                    watch=watch,
+                    batch=edit_batch,
+                    sync=sync,
+                    prefetched=prefetched,
+                    post_edit_queue=post_edit_queue,
+                    lint_summary=lint_summary,
+                )
+                sync.poll()
+            if post_edit_queue is not None:
+                post_edit_queue.close()
+        except SystemExit:
+            # a lint failure ends the batch, the files staged before it
+            # are still committed, as they would have been without --batch
+            if post_edit_queue is not None:
+                post_edit_queue.close(cancel=True)
+            if edit_batch is not None:
+                PROFILER.context = {}
+                edit_batch.finish(complete=False)
+            raise
+        finally:
+            # pushes already happened, their sync still runs
+            sync.flush()
+        if edit_batch is not None:
+            PROFILER.context = {}
+            edit_batch.finish()
 
 
 @cli.command()
 @click.argument("path", type=click.Path(path_type=Path), nargs=1)
+@click.option("--jobs", type=click.IntRange(min=1))
+@click.option("--refresh-examples", is_flag=True)
+@click.option("--profile", is_flag=True)
+@click.option("--profile-log", type=click.Path(dir_okay=False, path_type=Path))
 @click_add_options(click_global_options)
 @click.pass_context
 def generate_readme(
     ctx,
     path: Path,
+    jobs: int | None,
+    refresh_examples: bool,
+    profile: bool,
+    profile_log: Path | None,
     verbose_inf: bool,
     dict_output: bool,
     verbose: bool = False,
@@ -901,4 +3344,219 @@ def generate_readme(
         eprint("ERROR:", path.as_posix(), "is not a regular file.")
         sys.exit(1)
 
-    autogenerate_readme(path=path)
+    with profiling(command="generate_readme", profile=profile, profile_log=profile_log):
+        PROFILER.context = {"path": path.as_posix()}
+        autogenerate_readme(
+            path=path,
+            jobs=jobs,
+            refresh_examples=refresh_examples,
+        )
+
+
+@cli.command()
+@click.option("--runs", type=int, default=5)
+@click.option("--budget-ms", type=float, default=150.0)
+@click.option("--module", type=str, default="edittool.edittool")
+@click_add_options(click_global_options)
+@click.pass_context
+def benchmark_startup(
+    ctx,
+    runs: int,
+    budget_ms: float,
+    module: str,
+    verbose_inf: bool,
+    dict_output: bool,
+    verbose: bool = False,
+):
+    tty, verbose = tvicgvd(
+        ctx=ctx,
+        verbose=verbose,
+        verbose_inf=verbose_inf,
+        ic=ic,
+        gvd=gvd,
+    )
+    from .benchmark import benchmark_startup as _benchmark_startup
+
+    ok = _benchmark_startup(
+        module=module,
+        runs=runs,
+        budget_ms=budget_ms,
+    )
+    if not ok:
+        sys.exit(1)
+
+
+@cli.command()
+@click.option("--lines", type=int, default=10000)
+@click.option("--runs", type=int, default=20)
+@click_add_options(click_global_options)
+@click.pass_context
+def benchmark_edit_config(
+    ctx,
+    lines: int,
+    runs: int,
+    verbose_inf: bool,
+    dict_output: bool,
+    verbose: bool = False,
+):
+    if not verbose:
+        ic.disable()
+
+    tty, verbose = tvicgvd(
+        ctx=ctx,
+        verbose=verbose,
+        verbose_inf=verbose_inf,
+        ic=ic,
+        gvd=gvd,
+    )
+    from .benchmark import benchmark_edit_config as _benchmark_edit_config
+
+    _benchmark_edit_config(lines=lines, runs=runs)
+
+
+@cli.command()
+@click.option("--files", type=click.IntRange(min=1), default=20)
+@click.option(
+    "--batch-size",
+    "batch_sizes",
+    type=click.IntRange(min=1),
+    multiple=True,
+    default=(1, 10),
+)
+@click.option("--runs", type=click.IntRange(min=1), default=3)
+@click.option("--readme-examples", type=click.IntRange(min=0), default=10)
+@click.option("--log", type=click.Path(dir_okay=False, path_type=Path))
+@click_add_options(click_global_options)
+@click.pass_context
+def benchmark_projects(
+    ctx,
+    files: int,
+    batch_sizes: tuple[int, ...],
+    runs: int,
+    readme_examples: int,
+    log: Path | None,
+    verbose_inf: bool,
+    dict_output: bool,
+    verbose: bool = False,
+):
+    if not verbose:
+        ic.disable()
+
+    tty, verbose = tvicgvd(
+        ctx=ctx,
+        verbose=verbose,
+        verbose_inf=verbose_inf,
+        ic=ic,
+        gvd=gvd,
+    )
+    from .benchmark import benchmark_projects as _benchmark_projects
+
+    _benchmark_projects(
+        files=files,
+        batch_sizes=tuple(min(_size, files) for _size in batch_sizes),
+        runs=runs,
+        readme_examples=readme_examples,
+        log=log,
+    )
+
+
+@cli.command()
+@click.option("--megabytes", type=float, default=64.0)
+@click.option("--files", type=click.IntRange(min=1), default=2000)
+@click.option("--file-kilobytes", type=float, default=8.0)
+@click.option("--runs", type=click.IntRange(min=1), default=5)
+@click_add_options(click_global_options)
+@click.pass_context
+def benchmark_byte_vector_replacer(
+    ctx,
+    megabytes: float,
+    files: int,
+    file_kilobytes: float,
+    runs: int,
+    verbose_inf: bool,
+    dict_output: bool,
+    verbose: bool = False,
+):
+    if not verbose:
+        ic.disable()
+
+    tty, verbose = tvicgvd(
+        ctx=ctx,
+        verbose=verbose,
+        verbose_inf=verbose_inf,
+        ic=ic,
+        gvd=gvd,
+    )
+    from .benchmark import (
+        benchmark_byte_vector_replacer as _benchmark_byte_vector_replacer,
+    )
+
+    _benchmark_byte_vector_replacer(
+        megabytes=megabytes,
+        files=files,
+        file_kilobytes=file_kilobytes,
+        runs=runs,
+    )
+
+
+@cli.command()
+@click.argument("paths", type=click.Path(exists=True, path_type=Path), nargs=-1)
+@click.option("--jobs", type=click.IntRange(min=1))
+@click.option("--no-cache", is_flag=True)
+@click.option("--ignore-pylint", is_flag=True)
+@click.option("--summary", type=click.File("a"))
+@click_add_options(click_global_options)
+@click.pass_context
+def lint(
+    ctx,
+    paths: tuple[Path, ...],
+    jobs: int | None,
+    no_cache: bool,
+    ignore_pylint: bool,
+    summary,
+    verbose_inf: bool,
+    dict_output: bool,
+    verbose: bool = False,
+):
+    # every .py file of the git projects containing paths (default: the
+    # current directory), failing like run_pylint() on errors or worse
+    if not verbose:
+        ic.disable()
+
+    not_root()
+    tty, verbose = tvicgvd(
+        ctx=ctx,
+        verbose=verbose,
+        verbose_inf=verbose_inf,
+        ic=ic,
+        gvd=gvd,
+    )
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    # the paths, grouped by project, a path matching no tracked .py file
+    # is an error instead of a passing lint of nothing. Without paths, the
+    # whole project of the current directory.
+    projects: dict[Path, list[Path]] = {}
+    if not paths:
+        projects[GitSession(cwd=Path(os.getcwd()).resolve()).toplevel] = []
+    for path in paths:
+        folder = path if path.is_dir() else path.parent
+        projects.setdefault(GitSession(cwd=folder.resolve()).toplevel, []).append(path)
+    exit_code = 0
+    for toplevel, project_paths in projects.items():
+        try:
+            exit_code |= lint_project(
+                folder=toplevel,
+                jobs=jobs,
+                use_cache=not no_cache,
+                summary=summary,
+                only=project_paths,
+            )
+        except FileNotFoundError as e:
+            ctx.fail(str(e))
+    if exit_code:
+        ic(exit_code)
+        if (exit_code & 0b00011) > 0:
+            ic("pylint returned an error or worse, exiting")
+            if not ignore_pylint:
+                sys.exit(exit_code)